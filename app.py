@@ -6,6 +6,7 @@ from routes.upload_routes import upload_bp
 from routes.bank_fin_reconcile_routes import bank_fin_reconcile_bp
 from routes.bank_fin_tally_reconcile_routes import bank_fin_tally_reconcile_bp
 from routes.bank_tally_reconcile_routes import bank_tally_bp
+from routes.vendor_alias_routes import vendor_alias_bp
 
 app = Flask(__name__)
 app.secret_key = 'a_random_secret'
@@ -16,6 +17,7 @@ app.register_blueprint(upload_bp)
 app.register_blueprint(bank_fin_reconcile_bp)
 app.register_blueprint(bank_fin_tally_reconcile_bp)
 app.register_blueprint(bank_tally_bp)
+app.register_blueprint(vendor_alias_bp)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -15,13 +15,17 @@ CREATE TABLE IF NOT EXISTS bank_data (
     B_Deposit DECIMAL(18,2),
     B_Balance DECIMAL(18,2),
     bank_ven VARCHAR(255),
+    cheque_ref VARCHAR(50) DEFAULT NULL,
     statement_month VARCHAR(20),
     statement_year VARCHAR(10),
     bf_is_matched TINYINT DEFAULT 0,
     bf_date_matched DATETIME DEFAULT NULL,
     bft_is_matched TINYINT DEFAULT 0,
     bft_date_matched DATETIME DEFAULT NULL,
-    input_date DATETIME
+    bt_is_matched TINYINT DEFAULT 0,
+    bt_date_matched DATETIME DEFAULT NULL,
+    input_date DATETIME,
+    INDEX idx_bank_cheque_ref (acct_no, cheque_ref)
 );
 
 -- 2. FINANCE DATA
@@ -74,11 +78,15 @@ CREATE TABLE IF NOT EXISTS tally_data (
     T_Debit DECIMAL(18,2),
     T_Credit DECIMAL(18,2),
     tally_ven TEXT,
+    cheque_ref VARCHAR(50) DEFAULT NULL,
     statement_month VARCHAR(20),
     statement_year VARCHAR(10),
     bft_is_matched TINYINT DEFAULT 0,
     bft_date_matched DATETIME DEFAULT NULL,
-    input_date DATETIME
+    bt_is_matched TINYINT DEFAULT 0,
+    bt_date_matched DATETIME DEFAULT NULL,
+    input_date DATETIME,
+    INDEX idx_tally_cheque_ref (bank_code, acct_no, cheque_ref)
 );
 
 -- 4. BANK-FIN MATCHED DATA
@@ -225,6 +233,8 @@ CREATE TABLE IF NOT EXISTS bt_matched (
     bt_match_id VARCHAR(50),
     bt_source VARCHAR(50),
     cheque_ref VARCHAR(50),
+    bt_is_matched TINYINT,
+    bt_date_matched DATETIME,
 
     -- Bank columns
     bank_id INT,
@@ -259,3 +269,41 @@ CREATE TABLE IF NOT EXISTS bt_matched (
     bft_is_matched TINYINT,
     bft_date_matched DATETIME
 );
+
+-- 7. BANK-FIN RUN STATE (incremental reconcile)
+CREATE TABLE IF NOT EXISTS bf_run_state (
+    bank_code VARCHAR(10) NOT NULL,
+    acct_no VARCHAR(50) NOT NULL,  -- '*' for runs over every account of the bank
+    last_run_at DATETIME NOT NULL,
+    PRIMARY KEY (bank_code, acct_no)
+);
+
+-- 8. VENDOR ALIASES (bank vendor name -> finance vendor name, upper-cased)
+CREATE TABLE IF NOT EXISTS vendor_alias (
+    alias_id INT AUTO_INCREMENT PRIMARY KEY,
+    bank_code VARCHAR(10) NOT NULL,
+    vendor_name VARCHAR(255) NOT NULL,
+    alias_name VARCHAR(255) NOT NULL,
+    UNIQUE KEY uq_vendor_alias (bank_code, vendor_name)
+);
+
+INSERT IGNORE INTO vendor_alias (bank_code, vendor_name, alias_name) VALUES
+    ('MDB', 'JOYNALANDSONS', 'JOYNALSONS'),
+    ('MDB', 'TALIANDCO', 'TALICO'),
+    ('MTB', 'BANKVENDOR', 'FINVENDORALIAS');
+
+-- 9. VENDOR ALIAS CHANGES (bumped by every alias save/delete; alias caches reload when it moves)
+CREATE TABLE IF NOT EXISTS vendor_alias_state (
+    bank_code VARCHAR(10) NOT NULL PRIMARY KEY,
+    updated_at DATETIME(6) NOT NULL
+);
+
+-- Bank-tally match flags for databases created before bt_is_matched existed (run once)
+-- ALTER TABLE bank_data ADD COLUMN bt_is_matched TINYINT DEFAULT 0, ADD COLUMN bt_date_matched DATETIME DEFAULT NULL;
+-- ALTER TABLE tally_data ADD COLUMN bt_is_matched TINYINT DEFAULT 0, ADD COLUMN bt_date_matched DATETIME DEFAULT NULL;
+-- ALTER TABLE bt_matched ADD COLUMN bt_is_matched TINYINT, ADD COLUMN bt_date_matched DATETIME;
+
+-- Ingest-time cheque refs for databases created before cheque_ref existed (run once).
+-- Rows left NULL fall back to extraction at match time; '' means the narration has no ref.
+-- ALTER TABLE bank_data ADD COLUMN cheque_ref VARCHAR(50) DEFAULT NULL, ADD INDEX idx_bank_cheque_ref (acct_no, cheque_ref);
+-- ALTER TABLE tally_data ADD COLUMN cheque_ref VARCHAR(50) DEFAULT NULL, ADD INDEX idx_tally_cheque_ref (bank_code, acct_no, cheque_ref);
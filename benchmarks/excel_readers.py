@@ -0,0 +1,122 @@
+# benchmarks/excel_readers.py
+"""
+Time every installed Excel engine on real statement files and suggest ENGINE_PREFERENCE.
+
+    python -m benchmarks.excel_readers mdb=Midland.xlsx mtb=MTB.xls:AcStatementReport \
+        tally=Ledger.xlsx:Ledger fin=Finance.xlsx:Sheet1 --repeat 5
+
+Each file is read (raw sheet) and fully parsed once per installed engine for its extension;
+the best of --repeat runs is reported. An engine only counts as a candidate for a format when
+its parsed output equals the first engine's.
+"""
+
+import argparse
+import os
+import time
+
+from parsers import readers
+from parsers.fin_parser import parse_fin_statement
+from parsers.mdb_parser import parse_mdb_statement
+from parsers.mtb_parser import parse_mtb_statement
+from parsers.obl_parser import parse_obl_statement
+from parsers.tally_parser import parse_tally_file
+
+PARSERS = {
+    "mdb": lambda path, sheet: parse_mdb_statement(path),
+    "mtb": lambda path, sheet: parse_mtb_statement(path, sheet_name=sheet or "AcStatementReport"),
+    "obl": lambda path, sheet: parse_obl_statement(path),
+    "fin": lambda path, sheet: parse_fin_statement(path, sheet_name=sheet),
+    "tally": lambda path, sheet: parse_tally_file(path, sheet),
+}
+
+# Engines worth timing per extension, whether or not they are preferred today
+CANDIDATES = {
+    ".xlsx": ["calamine", "openpyxl"],
+    ".xlsm": ["calamine", "openpyxl"],
+    ".xls": ["calamine", "xlrd"],
+}
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def raw_read(kind, path, sheet, engine):
+    """The reader step alone: what the parser asks readers.py for."""
+    if kind == "tally":
+        def run():
+            with readers.sheet_rows(path, sheet, engine=engine) as rows:
+                return sum(1 for _ in rows)
+    else:
+        def run():
+            return readers.read_sheet(path, sheet, engine=engine)
+    return run
+
+
+def bench_file(kind, path, sheet, repeat):
+    ext = os.path.splitext(path)[-1].lower()
+    engines = [e for e in CANDIDATES.get(ext, []) if readers.engine_installed(e)]
+    saved = readers.ENGINE_PREFERENCE.get(ext)
+    results, baseline = [], None
+    try:
+        for engine in engines:
+            # Route the parser through this engine only
+            readers.ENGINE_PREFERENCE[ext] = [engine]
+            try:
+                read_s, _ = best_time(raw_read(kind, path, sheet, engine), repeat)
+                parse_s, df = best_time(lambda: PARSERS[kind](path, sheet), repeat)
+            except Exception as e:
+                results.append((engine, None, None, f"error: {e}"))
+                continue
+            if baseline is None:
+                baseline, same = df, True
+            else:
+                same = df.reset_index(drop=True).equals(baseline.reset_index(drop=True))
+            results.append((engine, read_s, parse_s, "same output" if same else "OUTPUT DIFFERS"))
+    finally:
+        readers.ENGINE_PREFERENCE[ext] = saved
+    return ext, results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("files", nargs="+", help="kind=path[:sheet], kind one of " + ", ".join(PARSERS))
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    fastest, file_counts = {}, {}
+    for spec in args.files:
+        kind, _, target = spec.partition("=")
+        path, _, sheet = target.partition(":")
+        if kind not in PARSERS:
+            ap.error(f"unknown kind '{kind}'")
+        ext, results = bench_file(kind, path, sheet or None, args.repeat)
+        file_counts[ext] = file_counts.get(ext, 0) + 1
+        print(f"\n{kind}: {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+        print(f"  {'engine':<10} {'read s':>8} {'parse s':>8}  check")
+        for engine, read_s, parse_s, note in results:
+            if read_s is None:
+                print(f"  {engine:<10} {'-':>8} {'-':>8}  {note}")
+                continue
+            print(f"  {engine:<10} {read_s:>8.3f} {parse_s:>8.3f}  {note}")
+            if note == "same output":
+                total, count = fastest.setdefault(ext, {}).get(engine, (0.0, 0))
+                fastest[ext][engine] = (total + parse_s, count + 1)
+
+    print("\nSuggested readers.ENGINE_PREFERENCE (total parse time, fastest first):")
+    for ext, totals in fastest.items():
+        # Only engines that parsed every file of the format identically
+        usable = {e: total for e, (total, count) in totals.items() if count == file_counts[ext]}
+        order = sorted(usable, key=usable.get)
+        order += [e for e in CANDIDATES[ext] if e not in order]
+        print(f"  {ext!r}: {order},")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,57 @@
 # logics/bank_fin_match_logic.py
 
+import bisect
+import heapq
+import os
+import time
+import numpy as np
 import pandas as pd
-from itertools import combinations
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.money import to_cents
 
 MAX_FINANCE_COMBO = 10  # Match 10 finance payment records against 1  bank transaction record
 
+# Per bank row limits for the 1-to-N phases; banks override these through their BANK_CONFIG entry.
+# A limit of None disables it. The search limits are off by default, since a capped search can miss
+# a match an unlimited one finds; rows that hit one are reported in `truncated`.
+DEFAULT_COMBO_LIMITS = {
+    'max_finance_combo': MAX_FINANCE_COMBO,
+    'max_combo_candidates': None,     # candidates searched, in finance frame order
+    'max_combo_evals': None,          # partial sums generated by the subset-sum search
+    'combo_time_budget': None,        # wall-clock seconds
+}
+
+def combo_limits(config=None, max_combo=None):
+    """Resolve the 1-to-N search limits for one bank from its config entry."""
+    limits = {key: (config or {}).get(key, default) for key, default in DEFAULT_COMBO_LIMITS.items()}
+    if max_combo is not None:
+        limits['max_finance_combo'] = max_combo
+    return limits
+
+# Minimum trigram Dice similarity for the fuzzy vendor phase. The phase is off unless a bank sets
+# fuzzy_vendor_threshold in its BANK_CONFIG entry; its pairs are tagged FUZZY_MATCH_TYPE for review.
+FUZZY_VENDOR_THRESHOLD = None
+FUZZY_MATCH_TYPE = '1 to 1 (fuzzy)'
+# Characters by which two fuzzy-matched names may differ outright (typos, LTD, CO); larger
+# differences must themselves be similar (see _differing_part_similar)
+FUZZY_MAX_DIFF_CHARS = 3
+
+# bank_data / fin_data columns that are not part of bf_matched: matching helpers, ingest-time
+# cheque refs and bank-tally match flags. Dropped before flattened matches are written.
+BF_MATCHED_DROP_COLS = [
+    '_vendor_first5', '_ven_alias', '_norm_amt', '_norm_date', 'cheque_ref', 'bt_is_matched', 'bt_date_matched',
+]
+
+class ComboSearchCutShort(Exception):
+    """Raised when a 1-to-N search hits its eval count or time budget."""
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
 # Bank-specific vendor alias dictionaries: Map inexact bank and finance vendor names (e.g., "ABC & Co." to "ABC and Co.").
+# The vendor_alias table is seeded from these; they are only used when no alias_map is passed in.
 vendor_alias_dicts = {
     "MDB": {
         "JOYNALANDSONS": "JOYNALSONS",
@@ -16,231 +62,554 @@ vendor_alias_dicts = {
     },
 }
 
+def alias_key(values):
+    """Normalize vendor names the way alias lookups expect: str(), stripped, upper-cased."""
+    # map(str) rather than astype(str): missing vendors become 'NONE'/'NAN' like str(val) did
+    # astype(object): map() infers the pyarrow str dtype, whose strip/upper rules differ from Python's
+    return pd.Series(values, dtype=object).map(str).astype(object).str.strip().str.upper()
+
+def resolve_aliases(values, alias_map):
+    """Vectorized get_vendor_alias: normalize and look up each distinct vendor name once."""
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    keys = alias_key(uniques)
+    aliases = keys.map(alias_map).fillna(keys).to_numpy(dtype=object)
+    resolved = aliases.take(np.where(codes >= 0, codes, 0)) if len(aliases) else np.empty(len(values), dtype=object)
+    missing = codes < 0
+    if missing.any():
+        missing_keys = alias_key(values[missing])
+        resolved[missing] = missing_keys.map(alias_map).fillna(missing_keys).to_numpy(dtype=object)
+    return pd.Series(resolved, index=values.index)
+
 def get_vendor_alias(val, bank_type):
     bank_alias_dict = vendor_alias_dicts.get(bank_type, {})
     return bank_alias_dict.get(str(val).strip().upper(), str(val).strip().upper())
 
-def is_weekend_match(bank_date, fin_date):
-    try:
-        bd = pd.to_datetime(bank_date)
-        fd = pd.to_datetime(fin_date)
-        return bd.strftime('%A') == 'Sunday' and fd.strftime('%A') == 'Thursday'
-    except:
-        return False
+# Weekend rule: a Sunday bank posting may settle a finance payment dated on a Thursday
+BANK_WEEKEND_DAY = 6  # Sunday
+FIN_WEEKEND_DAY = 3   # Thursday
+_WEEKEND_KEY = 'weekend'
 
-def normalize_for_match(df, vendor_col, amt_col, date_col, bank_type=None):
+def normalize_dates(values):
+    """
+    Parse a date column into normalized Timestamps, parsing each distinct value only once.
+    Strings and datetime.date objects from MySQL compare equal after this; bad values become NaT.
+    """
+    distinct = pd.Series(values.dropna().unique())
+    parsed = pd.Series(
+        [pd.to_datetime(v, errors='coerce') for v in distinct], index=distinct, dtype='datetime64[ns]')
+    return pd.to_datetime(values.map(parsed)).dt.normalize()
+
+def normalize_for_match(df, vendor_col, amt_col, date_col, bank_type=None, alias_map=None):
+    """
+    Add the _-prefixed match key columns. Bank rows (bank_type given) resolve _ven_alias through
+    `alias_map`, defaulting to vendor_alias_dicts for the bank.
+    """
     df = df.copy()  # <--- Add this line at the top to avoid modifying the original DataFrame
     df['_vendor_first5'] = df[vendor_col].str.upper().str.strip().str[:5]
     if bank_type is not None:
-        df['_ven_alias'] = df[vendor_col].apply(
-            lambda v: get_vendor_alias(v, bank_type))
+        if alias_map is None:
+            alias_map = vendor_alias_dicts.get(bank_type, {})
+        df['_ven_alias'] = resolve_aliases(df[vendor_col], alias_map)
     else:
         df['_ven_alias'] = df[vendor_col].str.upper().str.strip()
-    df['_norm_amt'] = pd.to_numeric(df[amt_col], errors='coerce').round(2)
-    df['_norm_date'] = df[date_col]
+    # Letters and digits only, so spacing and punctuation do not affect fuzzy similarity
+    df['_ven_fuzzy'] = df[vendor_col].str.upper().str.replace(r'[^A-Z0-9]', '', regex=True).replace('', np.nan)
+    df['_norm_amt'] = to_cents(df[amt_col])
+    df['_norm_date'] = normalize_dates(df[date_col])
+    df['_norm_weekday'] = df['_norm_date'].dt.dayofweek
     return df
 
-def bank_fin_match(bank_df, finance_df, config, bank_type, account_number=None, max_combo=MAX_FINANCE_COMBO):
+def _amount_key(amt):
+    # _norm_amt holds nullable cents; missing amounts never match
+    return None if pd.isna(amt) else int(amt)
+
+def _fin_date_keys(date_val, weekday):
+    """Date keys a finance row is filed under."""
+    if pd.isna(date_val):
+        return []
+    return [date_val, _WEEKEND_KEY] if weekday == FIN_WEEKEND_DAY else [date_val]
+
+def _bank_date_keys(date_val, weekday):
+    """Finance date keys a bank row accepts: its own date, plus any Thursday if it is a Sunday."""
+    if pd.isna(date_val):
+        return []
+    return [date_val, _WEEKEND_KEY] if weekday == BANK_WEEKEND_DAY else [date_val]
+
+def _build_match_index(finance_df, key_col, new_only=False):
+    """
+    Index finance rows by (vendor key, amount in cents, date key) for the 1-to-1 phases and by
+    (vendor key, date key) for the 1-to-N phases. Buckets hold finance positions in frame order,
+    so the head is always the earliest candidate and used rows can be skipped lazily.
+    With new_only, rows not flagged _is_new are left out.
+    """
+    amount_index = {}
+    candidate_index = {}
+    keys = zip(finance_df[key_col], finance_df['_norm_amt'],
+               finance_df['_norm_date'], finance_df['_norm_weekday'], finance_df['_is_new'])
+    for f_pos, (vendor, amt, date_val, weekday, is_new) in enumerate(keys):
+        if pd.isna(vendor) or (new_only and not is_new):
+            continue
+        amt_key = _amount_key(amt)
+        for date_key in _fin_date_keys(date_val, weekday):
+            candidate_index.setdefault((vendor, date_key), []).append(f_pos)
+            if amt_key is not None:
+                amount_index.setdefault((vendor, amt_key, date_key), deque()).append(f_pos)
+    return amount_index, candidate_index
+
+def _first_unused(bucket, unmatched_finance_pos):
+    while bucket and bucket[0] not in unmatched_finance_pos:
+        bucket.popleft()
+    return bucket[0] if bucket else None
+
+def _lookup_one_to_one(b_row, key_col, index, unmatched_finance_pos):
+    """
+    Return the earliest unused finance position with the same vendor key and amount
+    under any of the bank row's acceptable date keys.
+    """
+    amount_index, _ = index
+    amt_key = _amount_key(b_row['_norm_amt'])
+    vendor = b_row[key_col]
+    if pd.isna(vendor) or amt_key is None:
+        return None
+    heads = [
+        _first_unused(amount_index.get((vendor, amt_key, date_key)), unmatched_finance_pos)
+        for date_key in _bank_date_keys(b_row['_norm_date'], b_row['_norm_weekday'])
+    ]
+    heads = [f_pos for f_pos in heads if f_pos is not None]
+    return min(heads) if heads else None
+
+def _combo_candidates(b_row, key_col, index, unmatched_finance_pos):
+    """Unused finance positions sharing the bank row's vendor key and an acceptable date, in frame order."""
+    _, candidate_index = index
+    vendor = b_row[key_col]
+    if pd.isna(vendor):
+        return []
+    buckets = [
+        candidate_index.get((vendor, date_key), [])
+        for date_key in _bank_date_keys(b_row['_norm_date'], b_row['_norm_weekday'])
+    ]
+    return [f_pos for f_pos in heapq.merge(*buckets) if f_pos in unmatched_finance_pos]
+
+def _find_combo(amounts, target, max_combo, max_evals=None, deadline=None):
+    """
+    Subset-sum over integer cents. Returns the positions (into `amounts`) of the smallest
+    combination of 2..max_combo items summing to `target`, or None. Among combinations of the
+    same size the first one in itertools.combinations order wins, so results match the
+    exhaustive search this replaces.
+    Raises ComboSearchCutShort once more than `max_evals` partial sums have been generated
+    or time.monotonic() passes `deadline`.
+    """
+    n = len(amounts)
+    if n < 2 or max_combo < 2:
+        return None
+    bounded = target >= 0 and all(a >= 0 for a in amounts)
+
+    # floor[i][k]: a suffix state (i, k) must reach at least target minus the largest sum the
+    # prefix amounts[:i] could still contribute with the remaining max_combo - k picks
+    floor = []
+    prefix_sorted = []
+    for i in range(n + 1):
+        floor.append([
+            target - sum(prefix_sorted[max(0, len(prefix_sorted) - (max_combo - k)):])
+            for k in range(max_combo + 1)
+        ])
+        if i < n:
+            bisect.insort(prefix_sorted, amounts[i])
+
+    # reach[i][k]: sums reachable with exactly k items from amounts[i:]
+    reach = [None] * (n + 1)
+    reach[n] = [{0}] + [set() for _ in range(max_combo)]
+    evals = 0
+    for i in range(n - 1, -1, -1):
+        if deadline is not None and time.monotonic() > deadline:
+            raise ComboSearchCutShort('time')
+        a = amounts[i]
+        nxt = reach[i + 1]
+        cur = [nxt[0]]
+        for k in range(1, max_combo + 1):
+            evals += len(nxt[k - 1])
+            if max_evals is not None and evals > max_evals:
+                raise ComboSearchCutShort('evals')
+            sums = nxt[k] | {s + a for s in nxt[k - 1]}
+            if bounded:
+                lo = floor[i][k]
+                sums = {s for s in sums if lo <= s <= target}
+            cur.append(sums)
+        reach[i] = cur
+
+    size = next((r for r in range(2, max_combo + 1) if target in reach[0][r]), None)
+    if size is None:
+        return None
+
+    # Walk forward taking the earliest item that still leaves a feasible remainder
+    combo = []
+    remaining = target
+    for i in range(n):
+        need = size - len(combo)
+        if need == 0:
+            break
+        if remaining - amounts[i] in reach[i + 1][need - 1]:
+            combo.append(i)
+            remaining -= amounts[i]
+    return combo
+
+def _lookup_combo(b_row, candidates, fin_cents, limits, deadline=None):
+    """
+    Return the finance positions whose amounts sum to the bank amount, or None.
+    Candidates without an amount can never be part of a valid sum and are skipped.
+    """
+    target = _amount_key(b_row['_norm_amt'])
+    if target is None:
+        return None
+    candidates = [f_pos for f_pos in candidates if fin_cents[f_pos] is not None]
+    combo = _find_combo(
+        [fin_cents[f_pos] for f_pos in candidates], target, limits['max_finance_combo'],
+        max_evals=limits['max_combo_evals'], deadline=deadline)
+    if combo is None:
+        return None
+    return [candidates[i] for i in combo]
+
+# Matching phases in the order they run: (vendor key column, sum match?, match_type suffix)
+MATCH_PHASES = [
+    ('_vendor_first5', False, ''),          # 1-to-1 direct match
+    ('_vendor_first5', True, ''),           # 1-to-N direct sum match
+    ('_ven_alias', False, ' (alias)'),      # 1-to-1 vendor alias match
+    ('_ven_alias', True, ' (alias)'),       # 1-to-N vendor alias sum match
+]
+FUZZY_PHASE = len(MATCH_PHASES)  # runs last, over rows every exact phase left unmatched
+MATCH_KEY_COLS = ['_vendor_first5', '_ven_alias', '_ven_fuzzy', '_norm_amt', '_norm_date', '_norm_weekday', '_is_new']
+
+def _match_block(bank_keys, fin_keys, limits):
+    """
+    Run every matching phase over one set of normalized bank and finance rows.
+    Both frames hold only MATCH_KEY_COLS and are indexed by position in the caller's frames.
+    Bank rows not flagged _is_new already failed against every old finance row in an earlier
+    run, so they are only tried against new finance rows (1-to-1) or candidate sets that
+    include one (1-to-N).
+    Returns (matches, truncated): matches as (phase, bank position, [finance positions], match_type)
+    tuples, and 1-to-N searches cut short by `limits` as (phase, bank position, reason) tuples.
+    """
+    if not bank_keys['_is_new'].any() and not fin_keys['_is_new'].any():
+        return [], []
+    bank_rows = bank_keys.to_dict('records')
+    bank_labels = bank_keys.index.tolist()
+    fin_labels = fin_keys.index.tolist()
+    # Finance rows are addressed by position so candidate order always follows the frame order
+    fin_cents = [_amount_key(amt) for amt in fin_keys['_norm_amt']]
+    fin_is_new = fin_keys['_is_new'].tolist()
+    has_old_bank = not bank_keys['_is_new'].all()
+    unmatched_finance_pos = set(range(len(fin_keys)))
+    indexes = {}
+    new_indexes = {}
+    matches = []
+    truncated = []
+    max_candidates = limits['max_combo_candidates']
+    time_budget = limits['combo_time_budget']
+
+    pending = list(range(len(bank_rows)))
+    for phase, (key_col, is_sum, suffix) in enumerate(MATCH_PHASES):
+        if key_col not in indexes:
+            indexes[key_col] = _build_match_index(fin_keys, key_col)
+            if has_old_bank:
+                new_indexes[key_col] = _build_match_index(fin_keys, key_col, new_only=True)
+        index = indexes[key_col]
+        still_unmatched = []
+        for b_pos in pending:
+            b_row = bank_rows[b_pos]
+            if is_sum:
+                candidates = _combo_candidates(b_row, key_col, index, unmatched_finance_pos)
+                if not b_row['_is_new'] and not any(fin_is_new[f_pos] for f_pos in candidates):
+                    still_unmatched.append(b_pos)
+                    continue
+                if max_candidates is not None and len(candidates) > max_candidates:
+                    # Search the first candidates only; a match found there is still accepted
+                    candidates = candidates[:max_candidates]
+                    truncated.append((phase, bank_labels[b_pos], 'candidates'))
+                deadline = None if time_budget is None else time.monotonic() + time_budget
+                try:
+                    combo = _lookup_combo(b_row, candidates, fin_cents, limits, deadline)
+                except ComboSearchCutShort as e:
+                    truncated.append((phase, bank_labels[b_pos], e.reason))
+                    combo = None
+            else:
+                lookup_index = index if b_row['_is_new'] else new_indexes[key_col]
+                f_pos = _lookup_one_to_one(b_row, key_col, lookup_index, unmatched_finance_pos)
+                combo = None if f_pos is None else [f_pos]
+            if combo is None:
+                still_unmatched.append(b_pos)
+                continue
+            unmatched_finance_pos.difference_update(combo)
+            matches.append((
+                phase, bank_labels[b_pos], [fin_labels[f_pos] for f_pos in combo], f'1 to {len(combo)}{suffix}'
+            ))
+        pending = still_unmatched
+    return matches, truncated
+
+def _trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+def _dice(a, b):
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    if not grams_a or not grams_b:
+        return float(a == b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+def _differing_part_similar(key, other, threshold):
+    """
+    Whether the text left after removing the two vendor keys' common prefix and suffix is itself
+    similar. Names sharing a long common word ("RAHIM ENTERPRISE" vs "KARIM ENTERPRISE") score
+    high on the whole key but fail here. Differences of at most FUZZY_MAX_DIFF_CHARS characters
+    in total (typos, LTD, CO) always pass.
+    """
+    prefix = len(os.path.commonprefix([key, other]))
+    a, b = key[prefix:], other[prefix:]
+    suffix = len(os.path.commonprefix([a[::-1], b[::-1]]))
+    a, b = a[:len(a) - suffix], b[:len(b) - suffix]
+    if len(a) + len(b) <= FUZZY_MAX_DIFF_CHARS:
+        return True
+    return _dice(a, b) >= threshold
+
+def _build_trigram_index(vendor_keys):
+    """Inverted index from trigram to the distinct vendor keys containing it."""
+    key_grams = {key: _trigrams(key) for key in pd.unique(vendor_keys.dropna())}
+    inverted = {}
+    for key, grams in key_grams.items():
+        for gram in grams:
+            inverted.setdefault(gram, []).append(key)
+    return key_grams, inverted
+
+def _similar_vendors(key, trigram_index, threshold):
+    """
+    Finance vendor keys whose trigram Dice similarity with `key` reaches `threshold`, best first,
+    among those passing _differing_part_similar. Only keys sharing at least one trigram are
+    scored, so this never compares every pair.
+    """
+    key_grams, inverted = trigram_index
+    grams = _trigrams(key)
+    shared = Counter(other for gram in grams for other in inverted.get(gram, ()))
+    scored = [
+        (2 * count / (len(grams) + len(key_grams[other])), other)
+        for other, count in shared.items()
+    ]
+    return sorted(
+        (item for item in scored if item[0] >= threshold and _differing_part_similar(key, item[1], threshold)),
+        key=lambda item: -item[0])
+
+def _match_fuzzy(bank_keys, fin_keys, matches, threshold):
+    """
+    1-to-1 phase over near-miss vendor names. Bank rows left unmatched by every exact phase take
+    the unused finance row with equal amount and date key whose _ven_fuzzy is most similar,
+    the earliest one on ties. Runs over the whole frames since similar names can sit in
+    different vendor blocks. Same _is_new rule as _match_block.
+    """
+    matched_bank = {b_pos for _, b_pos, _, _ in matches}
+    unmatched_finance_pos = set(range(len(fin_keys))).difference(
+        f_pos for _, _, f_positions, _ in matches for f_pos in f_positions)
+    index = _build_match_index(fin_keys, '_ven_fuzzy')
+    new_index = _build_match_index(fin_keys, '_ven_fuzzy', new_only=True)
+    trigram_index = _build_trigram_index(fin_keys['_ven_fuzzy'])
+    similar_cache = {}
+    fuzzy_matches = []
+
+    for b_pos, b_row in enumerate(bank_keys.to_dict('records')):
+        vendor = b_row['_ven_fuzzy']
+        amt_key = _amount_key(b_row['_norm_amt'])
+        if b_pos in matched_bank or pd.isna(vendor) or amt_key is None:
+            continue
+        if vendor not in similar_cache:
+            similar_cache[vendor] = _similar_vendors(vendor, trigram_index, threshold)
+        amount_index, _ = index if b_row['_is_new'] else new_index
+        best = None
+        for score, fin_vendor in similar_cache[vendor]:
+            if best is not None and score < best[0]:
+                break
+            for date_key in _bank_date_keys(b_row['_norm_date'], b_row['_norm_weekday']):
+                f_pos = _first_unused(amount_index.get((fin_vendor, amt_key, date_key)), unmatched_finance_pos)
+                if f_pos is not None and (best is None or f_pos < best[1]):
+                    best = (score, f_pos)
+        if best is None:
+            continue
+        unmatched_finance_pos.discard(best[1])
+        fuzzy_matches.append((FUZZY_PHASE, b_pos, [best[1]], FUZZY_MATCH_TYPE))
+    return fuzzy_matches
+
+def vendor_blocks(bank_keys, fin_keys):
+    """
+    Split bank and finance positions into independent blocks. Every phase needs an equal
+    _vendor_first5 or _ven_alias, so rows linked through either key are kept together.
+    Blocks missing either side are dropped since nothing in them can match.
+    """
+    parent = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def row_keys(df):
+        return [
+            [k for k in (('first5', f5), ('alias', alias)) if not pd.isna(k[1])]
+            for f5, alias in zip(df['_vendor_first5'], df['_ven_alias'])
+        ]
+
+    bank_row_keys = row_keys(bank_keys)
+    fin_row_keys = row_keys(fin_keys)
+    for keys in bank_row_keys + fin_row_keys:
+        for key in keys[1:]:
+            parent[find(key)] = find(keys[0])
+
+    blocks = {}
+    for side, all_keys in enumerate((bank_row_keys, fin_row_keys)):
+        for pos, keys in enumerate(all_keys):
+            if keys:
+                blocks.setdefault(find(keys[0]), ([], []))[side].append(pos)
+    return [(b_pos, f_pos) for b_pos, f_pos in blocks.values() if b_pos and f_pos]
+
+def _match_block_group(block_frames, limits):
+    matches, truncated = [], []
+    for bank_keys, fin_keys in block_frames:
+        block_matches, block_truncated = _match_block(bank_keys, fin_keys, limits)
+        matches.extend(block_matches)
+        truncated.extend(block_truncated)
+    return matches, truncated
+
+def _match_parallel(bank_keys, fin_keys, limits, workers):
+    """
+    Solve vendor blocks in a process pool. Blocks are packed largest-first into a few
+    tasks per worker so tiny vendors do not each pay the pickling round trip.
+    """
+    blocks = vendor_blocks(bank_keys, fin_keys)
+    n_tasks = min(len(blocks), workers * 4)
+    if n_tasks <= 1:
+        return _match_block(bank_keys, fin_keys, limits)
+    tasks = [(0, i, []) for i in range(n_tasks)]
+    for b_pos, f_pos in sorted(blocks, key=lambda blk: len(blk[0]) * len(blk[1]), reverse=True):
+        load, i, frames = heapq.heappop(tasks)
+        frames.append((bank_keys.iloc[b_pos], fin_keys.iloc[f_pos]))
+        heapq.heappush(tasks, (load + len(b_pos) * len(f_pos), i, frames))
+
+    matches, truncated = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_match_block_group, frames, limits) for _, _, frames in tasks]
+        for future in futures:
+            task_matches, task_truncated = future.result()
+            matches.extend(task_matches)
+            truncated.extend(task_truncated)
+    return matches, truncated
+
+def _new_since(df, new_since):
+    """Flag rows uploaded after `new_since`; every row counts as new without it or an input_date."""
+    if new_since is None or 'input_date' not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    input_date = pd.to_datetime(df['input_date'], errors='coerce')
+    return (input_date.isna() | (input_date > pd.Timestamp(new_since))).to_numpy()
+
+def bank_fin_match(bank_df, finance_df, config, bank_type, account_number=None, max_combo=None, workers=None,
+                   new_since=None, alias_map=None):
+    """
+    Match bank debits against finance payments. With workers > 1 the independent vendor
+    blocks are solved in a process pool; results and match IDs are identical either way.
+    The 1-to-N search limits come from `config` (see DEFAULT_COMBO_LIMITS); `max_combo`
+    overrides its max_finance_combo.
+    If the bank opts in (config fuzzy_vendor_threshold), a fuzzy vendor phase then pairs leftover
+    rows with equal amount and date whose vendor names are near misses, as FUZZY_MATCH_TYPE.
+    With `new_since` (the previous run's start) the run is incremental: rows whose input_date is
+    not after it are treated as already tried against each other and only paired with new rows.
+    That no longer holds once the aliases change, so run in full (new_since None) after an edit.
+    `alias_map` is the bank's vendor alias mapping (see utils.vendor_alias.get_alias_map).
+
+    Returns (matched, unmatched_bank_pos, unmatched_finance_pos, truncated). `matched` is a compact
+    frame of bf_match_id, source, row_pos and match_type, where row_pos is the row position in the
+    bank_df or finance_df passed in; pass it to flatten_bf_matches to build bf_matched rows.
+    `truncated` lists the 1-to-N searches cut short by a limit: row_pos in bank_df, match_type of
+    the phase, reason ('candidates', 'evals' or 'time') and whether the row matched anyway.
+    """
+    limits = combo_limits(config, max_combo)
+    fin_mask = np.ones(len(finance_df), dtype=bool)
     # Filter finance_df by Sender Bank if the column exists
     if 'F_Sender_Bank' in finance_df.columns:
-        finance_df = finance_df[finance_df['F_Sender_Bank'] == bank_type]
+        fin_mask &= (finance_df['F_Sender_Bank'] == bank_type).to_numpy()
     # Filter finance_df by Sender Account if the column exists and account_number is provided
     if account_number and 'F_Sender_Account' in finance_df.columns:
-        finance_df = finance_df[finance_df['F_Sender_Account'] == account_number]
+        fin_mask &= (finance_df['F_Sender_Account'] == account_number).to_numpy()
+    fin_input_pos = np.flatnonzero(fin_mask)
+    finance_df = finance_df.iloc[fin_input_pos]
+
     bank_amt_col = config['debit_col']
     bank_date_col = config['date_col']
     bank_vendor_col = config['bank_ven_col']
     fin_amt_col = 'F_Credit_Amount' if 'F_Credit_Amount' in finance_df.columns else 'Amount'
     fin_date_col = 'F_Payment_Date' if 'F_Payment_Date' in finance_df.columns else 'Date'
     fin_vendor_col = 'fin_ven' if 'fin_ven' in finance_df.columns else 'Vendor'
-    bank_df = normalize_for_match(
-        bank_df, bank_vendor_col, bank_amt_col, bank_date_col, bank_type)
-    finance_df = normalize_for_match(
-        finance_df, fin_vendor_col, fin_amt_col, fin_date_col, None)
-
-    matched_rows = []
-    unmatched_bank_idxs = []
-    unmatched_finance_idxs = set(finance_df.index)
-    match_id_counter = 1
-
-    # 1-to-1 direct match loop
-    for b_idx, b_row in bank_df.iterrows():
-        match_found = False
-        for f_idx, f_row in finance_df.iterrows():
-            if f_idx not in unmatched_finance_idxs:
-                continue
-            is_weekend = is_weekend_match(
-                b_row[bank_date_col], f_row[fin_date_col])
-            if (
-                b_row['_vendor_first5'] == f_row['_vendor_first5']
-                and b_row['_norm_amt'] == f_row['_norm_amt']
-                and (b_row['_norm_date'] == f_row['_norm_date'] or is_weekend)
-            ):
-                bf_match_id = f"{match_id_counter:04}"
-                matched_rows.append({
-                    'bf_match_id': bf_match_id, 'source': 'Bank', 'match_type': '1 to 1',
-                    **b_row.drop([c for c in b_row.index if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                })
-                matched_rows.append({
-                    'bf_match_id': bf_match_id, 'source': 'Finance', 'match_type': '1 to 1',
-                    **f_row.drop([c for c in f_row.index if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                })
-                unmatched_finance_idxs.remove(f_idx)
-                match_id_counter += 1
-                match_found = True
-                break
-        if not match_found:
-            unmatched_bank_idxs.append(b_idx)
-
-    # 1-to-N direct sum matching loop
-    unmatched_bank_idxs_1ton = []
-    for b_idx in unmatched_bank_idxs:
-        b_row = bank_df.loc[b_idx]
-        candidates = [
-            f_idx for f_idx in unmatched_finance_idxs
-            if (b_row['_vendor_first5'] == finance_df.loc[f_idx, '_vendor_first5'] and
-                (b_row['_norm_date'] == finance_df.loc[f_idx, '_norm_date'] or
-                 is_weekend_match(b_row[bank_date_col], finance_df.loc[f_idx, fin_date_col])))
-        ]
-        found_combo = False
-        for r in range(2, max_combo + 1):
-            for combo in combinations(candidates, r):
-                amt_sum = sum([finance_df.loc[f_idx, '_norm_amt']
-                              for f_idx in combo])
-                if pd.isna(amt_sum) or pd.isna(b_row['_norm_amt']):
-                    continue
-                if round(amt_sum, 2) == round(b_row['_norm_amt'], 2):
-                    bf_match_id = f"{match_id_counter:04}"
-                    matched_rows.append({
-                        'bf_match_id': bf_match_id, 'source': 'Bank', 'match_type': f'1 to {r}',
-                        **b_row.drop([c for c in b_row.index if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                    })
-                    for f_idx in combo:
-                        matched_rows.append({
-                            'bf_match_id': bf_match_id, 'source': 'Finance', 'match_type': f'1 to {r}',
-                            **finance_df.loc[f_idx].drop([c for c in finance_df.columns if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                        })
-                        unmatched_finance_idxs.remove(f_idx)
-                    match_id_counter += 1
-                    found_combo = True
-                    break
-            if found_combo:
-                break
-        if not found_combo:
-            unmatched_bank_idxs_1ton.append(b_idx)
-
-    # 1-to-1 vendor alias matching loop
-    still_unmatched_bank_idxs = []
-    for b_idx in unmatched_bank_idxs_1ton:
-        b_row = bank_df.loc[b_idx]
-        match_found = False
-        for f_idx in list(unmatched_finance_idxs):
-            f_row = finance_df.loc[f_idx]
-            is_weekend = is_weekend_match(
-                b_row[bank_date_col], f_row[fin_date_col])
-            if (
-                b_row['_ven_alias'] == f_row['_ven_alias']
-                and b_row['_norm_amt'] == f_row['_norm_amt']
-                and (b_row['_norm_date'] == f_row['_norm_date'] or is_weekend)
-            ):
-                bf_match_id = f"{match_id_counter:04}"
-                matched_rows.append({
-                    'bf_match_id': bf_match_id, 'source': 'Bank', 'match_type': '1 to 1 (alias)',
-                    **b_row.drop([c for c in b_row.index if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                })
-                matched_rows.append({
-                    'bf_match_id': bf_match_id, 'source': 'Finance', 'match_type': '1 to 1 (alias)',
-                    **f_row.drop([c for c in f_row.index if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                })
-                unmatched_finance_idxs.remove(f_idx)
-                match_id_counter += 1
-                match_found = True
-                break
-        if not match_found:
-            still_unmatched_bank_idxs.append(b_idx)
-
-    # 1-to-N vendor alias sum matching loop
-    unmatched_bank_idxs_alias_1ton = []
-    for b_idx in still_unmatched_bank_idxs:
-        b_row = bank_df.loc[b_idx]
-        candidates = [
-            f_idx for f_idx in unmatched_finance_idxs
-            if (b_row['_ven_alias'] == finance_df.loc[f_idx, '_ven_alias'] and
-                (b_row['_norm_date'] == finance_df.loc[f_idx, '_norm_date'] or
-                 is_weekend_match(b_row[bank_date_col], finance_df.loc[f_idx, fin_date_col])))
-        ]
-        found_combo = False
-        for r in range(2, max_combo + 1):
-            for combo in combinations(candidates, r):
-                amt_sum = sum([finance_df.loc[f_idx, '_norm_amt']
-                              for f_idx in combo])
-                if pd.isna(amt_sum) or pd.isna(b_row['_norm_amt']):
-                    continue
-                if round(amt_sum, 2) == round(b_row['_norm_amt'], 2):
-                    bf_match_id = f"{match_id_counter:04}"
-                    matched_rows.append({
-                        'bf_match_id': bf_match_id, 'source': 'Bank', 'match_type': f'1 to {r} (alias)',
-                        **b_row.drop([c for c in b_row.index if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                    })
-                    for f_idx in combo:
-                        matched_rows.append({
-                            'bf_match_id': bf_match_id, 'source': 'Finance', 'match_type': f'1 to {r} (alias)',
-                            **finance_df.loc[f_idx].drop([c for c in finance_df.columns if c.startswith('_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-                        })
-                        unmatched_finance_idxs.remove(f_idx)
-                    match_id_counter += 1
-                    found_combo = True
-                    break
-            if found_combo:
-                break
-        if not found_combo:
-            unmatched_bank_idxs_alias_1ton.append(b_idx)
+    bank_keys = normalize_for_match(bank_df, bank_vendor_col, bank_amt_col, bank_date_col, bank_type, alias_map)
+    bank_keys['_is_new'] = _new_since(bank_df, new_since)
+    bank_keys = bank_keys[MATCH_KEY_COLS].reset_index(drop=True)
+    fin_keys = normalize_for_match(finance_df, fin_vendor_col, fin_amt_col, fin_date_col, None)
+    fin_keys['_is_new'] = _new_since(finance_df, new_since)
+    fin_keys = fin_keys[MATCH_KEY_COLS].reset_index(drop=True)
 
-    unmatched_bank = [
-        bank_df.loc[idx].drop([c for c in bank_df.columns if c.startswith(
-            '_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-        for idx in unmatched_bank_idxs_alias_1ton
-    ]
-    unmatched_finance = [
-        finance_df.loc[idx].drop([c for c in finance_df.columns if c.startswith(
-            '_vendor_') or c.startswith('_ven_alias') or c.startswith('_norm_')]).to_dict()
-        for idx in unmatched_finance_idxs
-    ]
-    return matched_rows, unmatched_bank, unmatched_finance
-
-def flatten_bf_matches(matched_rows, bank_cols, fin_cols, run_tag=""):
-    records = []
-    match_id_map = {}
-    next_counter = 1
-    for row in matched_rows:
-        orig = row.get("bf_match_id")
-        if orig not in match_id_map:
-            match_id_map[orig] = next_counter
-            next_counter += 1
-        row_match_id = f"BFM_{run_tag}_{match_id_map[orig]:04}" if run_tag else orig
-        record = {
-            "bf_match_id": row_match_id,
-            "bf_source": row.get("source"),
-            "bf_match_type": row.get("match_type", ""),
-        }
-        # if row["source"] == "Bank":
-        #     for col in bank_cols:
-        #         if col == "id":
-        #             record["bank_id"] = row.get(col, "")
-        #         else:
-        #             record[col] = row.get(col, "")
-        # elif row["source"] == "Finance":
-        #     for col in fin_cols:
-        #         if col == "id":
-        #             record["fin_id"] = row.get(col, "")
-        #         else:
-        #             record[col] = row.get(col, "")
-        if row["source"] == "Bank":
-            for col in bank_cols:
-                record[col] = row.get(col, "")
-        elif row["source"] == "Finance":
-            for col in fin_cols:
-                record[col] = row.get(col, "")
-        
-        records.append(record)
-    return pd.DataFrame(records)
+    if workers and workers > 1:
+        matches, truncated = _match_parallel(bank_keys, fin_keys, limits, workers)
+    else:
+        matches, truncated = _match_block(bank_keys, fin_keys, limits)
+    fuzzy_threshold = (config or {}).get('fuzzy_vendor_threshold', FUZZY_VENDOR_THRESHOLD)
+    if fuzzy_threshold is not None:
+        matches += _match_fuzzy(bank_keys, fin_keys, matches, fuzzy_threshold)
+
+    # Number matches the way a single sequential pass would: by phase, then bank row order
+    matches.sort(key=lambda m: (m[0], m[1]))
+    match_ids, sources, row_pos, match_types = [], [], [], []
+    for match_id_counter, (_, b_pos, f_positions, match_type) in enumerate(matches, start=1):
+        bf_match_id = f"{match_id_counter:04}"
+        n_rows = len(f_positions) + 1
+        match_ids += [bf_match_id] * n_rows
+        sources += ['Bank'] + ['Finance'] * len(f_positions)
+        row_pos += [b_pos] + [int(fin_input_pos[f_pos]) for f_pos in f_positions]
+        match_types += [match_type] * n_rows
+    matched = pd.DataFrame({
+        'bf_match_id': match_ids, 'source': sources,
+        'row_pos': np.array(row_pos, dtype=np.int64), 'match_type': match_types,
+    })
+
+    is_bank = (matched['source'] == 'Bank').to_numpy()
+    matched_pos = matched['row_pos'].to_numpy()
+    unmatched_bank_pos = np.setdiff1d(np.arange(len(bank_df)), matched_pos[is_bank])
+    unmatched_finance_pos = np.setdiff1d(fin_input_pos, matched_pos[~is_bank])
+
+    truncated.sort()
+    truncated = pd.DataFrame({
+        'row_pos': np.array([b_pos for _, b_pos, _ in truncated], dtype=np.int64),
+        'match_type': [f'1 to N{MATCH_PHASES[phase][2]}' for phase, _, _ in truncated],
+        'reason': [reason for _, _, reason in truncated],
+    })
+    truncated['matched'] = truncated['row_pos'].isin(matched_pos[is_bank])
+    return matched, unmatched_bank_pos, unmatched_finance_pos, truncated
+
+def flatten_bf_matches(matched, bank_df, fin_df, run_tag=""):
+    """
+    Build bf_matched rows from the compact output of bank_fin_match with one take per side,
+    keeping each match's bank row first and its finance rows after it.
+    """
+    # Renumber in order of first appearance so each run tag gets 0001, 0002, ...
+    codes = pd.factorize(matched['bf_match_id'])[0] + 1
+    if run_tag:
+        match_ids = pd.Series([f"BFM_{run_tag}_{n:04}" for n in codes])
+    else:
+        match_ids = matched['bf_match_id'].reset_index(drop=True)
+
+    is_bank = (matched['source'] == 'Bank').to_numpy()
+    row_pos = matched['row_pos'].to_numpy()
+    parts = pd.concat([
+        bank_df.iloc[row_pos[is_bank]],
+        fin_df.iloc[row_pos[~is_bank]],
+    ], ignore_index=True)
+    # Undo the bank/finance split so rows come back in match order
+    order = np.argsort(np.concatenate([np.flatnonzero(is_bank), np.flatnonzero(~is_bank)]), kind='stable')
+    records = parts.take(order).reset_index(drop=True)
+    records.insert(0, "bf_match_type", matched['match_type'].to_numpy())
+    records.insert(0, "bf_source", matched['source'].to_numpy())
+    records.insert(0, "bf_match_id", match_ids.to_numpy())
+    return records
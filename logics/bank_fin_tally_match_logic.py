@@ -1,7 +1,10 @@
 # logics/bank_fin_tally_match_logic.py
 
+import numpy as np
 import pandas as pd
-import re
+from collections import deque
+
+from utils.money import to_cents
 
 # Map bank code to bank amount column name for BFT matching
 # bank_amount_columns = {
@@ -10,109 +13,236 @@ import re
 #     # Extend as needed
 # }
 
-def _extract_numeric(val):
-    if pd.isnull(val):
-        return ''
-    return ''.join(re.findall(r'\d+', str(val)))
+# bf_matched / tally_data columns that are not part of bft_matched; dropped before matches are written
+BFT_MATCHED_DROP_COLS = [
+    'id', '_vendor_first5', '_ven_alias', '_norm_amt', '_norm_date', 'cheque_ref', 'bt_is_matched', 'bt_date_matched',
+]
+
+def _voucher_digits(values):
+    """All digits of each voucher number, joined, in one vectorized pass; '' when missing."""
+    values = pd.Series(values, dtype=object)
+    return values.map(str, na_action='ignore').str.replace(r'\D', '', regex=True).fillna('')
+
+def _build_tally_index(tally_vouchers, tally_cents):
+    """
+    Index tally positions by (voucher digits, amount in cents). Queues keep tally order,
+    so the head is the earliest candidate and used rows can be dropped lazily.
+    """
+    tally_index = {}
+    for pos, (vch, amt) in enumerate(zip(tally_vouchers, tally_cents)):
+        if pd.isna(amt):
+            continue
+        tally_index.setdefault((vch, int(amt)), deque()).append(pos)
+    return tally_index
+
+def _next_tally(queue, used_tally_pos, group_tally_pos):
+    """Earliest tally position in `queue` not used by an earlier group or this one."""
+    if not queue:
+        return None
+    while queue and queue[0] in used_tally_pos:
+        queue.popleft()
+    return next((pos for pos in queue if pos not in group_tally_pos), None)
 
 # def _get_bank_amount(bank_row, bank_code):
 #     col_name = bank_amount_columns.get(bank_code)
 #     if not col_name or col_name not in bank_row:
 #         raise ValueError(f"Unknown or missing amount column for bank: {bank_code}")
 #     return float(bank_row[col_name])
-def _get_bank_amount(bank_row):
-    if 'B_Withdrawal' not in bank_row:
+def _get_bank_amounts(bf_df):
+    """Bank withdrawal of every bf_df row in cents (None when missing)."""
+    if 'B_Withdrawal' not in bf_df.columns:
         raise ValueError("Missing 'B_Withdrawal' column in bank_row.")
-    return float(bank_row['B_Withdrawal'])
+    return to_cents(bf_df['B_Withdrawal'])
+
+def _assemble_bft_matches(bf_df, tally_df, match_ids, match_types, sources, positions):
+    """
+    Build bft_matched rows from parallel bft_match_id, bft_match_type, bft_source and row
+    position arrays. Bank and Finance positions point into bf_df, Tally positions into tally_df.
+    """
+    if len(match_ids) == 0:
+        return pd.DataFrame()
+    match_ids, match_types, sources = np.asarray(match_ids), np.asarray(match_types), np.asarray(sources)
+    positions = np.asarray(positions, dtype=np.int64)
+    is_tally = sources == 'Tally'
+    parts = []
+    for frame, mask in ((bf_df, ~is_tally), (tally_df, is_tally)):
+        part = frame.iloc[positions[mask]].reset_index(drop=True)
+        part['bft_match_id'] = match_ids[mask]
+        part['bft_match_type'] = match_types[mask]
+        part['bft_source'] = sources[mask]
+        parts.append(part)
+    bft_matched_df = pd.concat(parts, ignore_index=True)
+    # Undo the bf/tally split so each group reads Bank, Finance..., Tally...
+    order = np.argsort(np.concatenate([np.flatnonzero(~is_tally), np.flatnonzero(is_tally)]), kind='stable')
+    return bft_matched_df.take(order).reset_index(drop=True)
 
 # def bank_fin_tally_match(bf_df, tally_df, bank_code):
 def bank_fin_tally_match(bf_df, tally_df, bank_code, run_tag=""):
+    """
+    Match bf_matched groups against tally rows. Every finance row of a group needs its own
+    unused tally row with the same voucher digits and amount (the earliest one wins), and the
+    finance and tally totals must both equal the bank withdrawal.
+    """
 
     # print("Columns in bf_df before matching:", bf_df.columns.tolist())
 
     tally_df['tally_uid'] = tally_df['tally_uid'].astype(str)
-    tally_df = tally_df.set_index('tally_uid', drop=False)
-    used_tally_uids = set()
-
-    grouped = bf_df.groupby('bf_match_id')
-    bft_matched_rows = []
+    tally_df = tally_df.reset_index(drop=True)
+    # Voucher digits and cents are extracted once, then looked up per finance row
+    tally_index = _build_tally_index(_voucher_digits(tally_df['T_Vch_No']), to_cents(tally_df['T_Credit']))
+    used_tally_pos = set()
+
+    bf_df = bf_df.reset_index(drop=True)
+    sources = bf_df['bf_source'].str.lower().to_numpy()
+    fin_vouchers = _voucher_digits(bf_df['F_Voucher_No']).tolist()
+    fin_cents = [None if pd.isna(amt) else int(amt) for amt in to_cents(bf_df['F_Credit_Amount'])]
+    bank_amounts = None
+    bft_match_rows = []
     bft_id_counter = 1
 
-    for _, group in grouped:
-        bank_rows = group[group['bf_source'].str.lower() == 'bank']
-        finance_rows = group[group['bf_source'].str.lower() == 'finance']
+    for _, positions in bf_df.groupby('bf_match_id').indices.items():
+        bank_pos = [pos for pos in positions if sources[pos] == 'bank']
+        finance_pos = [pos for pos in positions if sources[pos] == 'finance']
 
-        if bank_rows.shape[0] != 1 or finance_rows.shape[0] < 1:
+        if len(bank_pos) != 1 or len(finance_pos) < 1:
             continue
 
-        bank_row = bank_rows.iloc[0]
-        
-        # print("bank_row keys BEFORE metadata:", bank_row.keys())
-        
-        # finance_vouchers = finance_rows['Fin_Voucher No'].apply(_extract_numeric)
-        # finance_amounts = finance_rows['Fin_Credit Amount'].astype(float)
-        finance_vouchers = finance_rows['F_Voucher_No'].apply(_extract_numeric)
-        finance_amounts = finance_rows['F_Credit_Amount'].astype(float)
         # bank_amount = _get_bank_amount(bank_row, bank_code)
-        bank_amount = _get_bank_amount(bank_row)
-
-        matched_tally_uids = []
-        tally_candidates = tally_df[~tally_df.index.isin(used_tally_uids)].copy()
-        # tally_candidates['vch_suffix'] = tally_candidates['Vch No.'].apply(_extract_numeric)
-        # tally_candidates['Credit'] = tally_candidates['Credit'].astype(float)
-        tally_candidates['vch_suffix'] = tally_candidates['T_Vch_No'].apply(_extract_numeric)
-        tally_candidates['T_Credit'] = tally_candidates['T_Credit'].astype(float)
-
-        for vch, amt in zip(finance_vouchers, finance_amounts):
-            tally_match = tally_candidates[
-                (tally_candidates['vch_suffix'] == vch) &
-                (tally_candidates['T_Credit'] == amt)
-            ]
-            if not tally_match.empty:
-                uid = str(tally_match['tally_uid'].iloc[0])
-                matched_tally_uids.append(uid)
-            else:
+        if bank_amounts is None:
+            bank_amounts = _get_bank_amounts(bf_df)
+        bank_amount = bank_amounts.iloc[bank_pos[0]]
+        bank_amount = None if pd.isna(bank_amount) else int(bank_amount)
+
+        matched_tally_pos = []
+        for fin_pos in finance_pos:
+            amt = fin_cents[fin_pos]
+            if amt is None:
+                break
+            tally_pos = _next_tally(tally_index.get((fin_vouchers[fin_pos], amt)), used_tally_pos, matched_tally_pos)
+            if tally_pos is None:
                 break
+            matched_tally_pos.append(tally_pos)
 
-        n_fin = len(finance_rows)
-        n_tally = len(matched_tally_uids)
-        group_sum_fin = finance_amounts.sum()
-        group_sum_tally = tally_df.loc[matched_tally_uids]['T_Credit'].sum() if matched_tally_uids else 0
+        n_fin = len(finance_pos)
+        n_tally = len(matched_tally_pos)
+        # Each tally row carries the cents of the finance row it was looked up with
+        group_sum = sum(fin_cents[pos] for pos in finance_pos) if n_tally == n_fin else None
 
-        if n_fin == n_tally and abs(group_sum_fin - bank_amount) < 1e-4 and abs(group_sum_tally - bank_amount) < 1e-4:
-            used_tally_uids.update(matched_tally_uids)
+        if n_fin == n_tally and bank_amount is not None and group_sum == bank_amount:
+            used_tally_pos.update(matched_tally_pos)
             # bft_match_id = f'BFTM_{bft_id_counter:04d}'
             bft_match_id = f"BFTM_{run_tag}_{bft_id_counter:04d}" if run_tag else f"BFTM_{bft_id_counter:04d}"
 
             bft_match_type = f"1 to {n_fin} to {n_tally}"
 
-            bank_out = bank_row.copy()
-            bank_out['bft_match_id'] = bft_match_id
-            bank_out['bft_match_type'] = bft_match_type
-            bank_out['bft_source'] = 'Bank'
-            bft_matched_rows.append(bank_out)
-
-            for _, fin_row in finance_rows.iterrows():
+            # Output rows as (source, row position in bf_df or tally_df), assembled in one pass below
+            bft_match_rows.append((bft_match_id, bft_match_type, 'Bank', bank_pos[0]))
+            for fin_pos in finance_pos:
+                bft_match_rows.append((bft_match_id, bft_match_type, 'Finance', fin_pos))
+            for tally_pos in matched_tally_pos:
+                bft_match_rows.append((bft_match_id, bft_match_type, 'Tally', tally_pos))
 
-                # print("fin_row keys BEFORE metadata:", fin_row.keys())
-
-                fin_out = fin_row.copy()
-                fin_out['bft_match_id'] = bft_match_id
-                fin_out['bft_match_type'] = bft_match_type
-                fin_out['bft_source'] = 'Finance'
-                bft_matched_rows.append(fin_out)
+            bft_id_counter += 1
 
-            for uid in matched_tally_uids:
-                tally_out = tally_df.loc[uid].copy()
+    if not bft_match_rows:
+        return pd.DataFrame()
+    return _assemble_bft_matches(bf_df, tally_df, *zip(*bft_match_rows))
 
-                # print("tally_out keys BEFORE metadata:", tally_out.keys())
 
-                tally_out['bft_match_id'] = bft_match_id
-                tally_out['bft_match_type'] = bft_match_type
-                tally_out['bft_source'] = 'Tally'
-                bft_matched_rows.append(tally_out)
+def bank_fin_tally_match_join(bf_df, tally_df, bank_code, run_tag=""):
+    """
+    Join-based engine for bank_fin_tally_match with the same output, built from merge and
+    groupby on whole frames instead of a loop over groups.
 
-            bft_id_counter += 1
-
-    bft_matched_df = pd.DataFrame(bft_matched_rows)
-    return bft_matched_df
+    A group's k-th finance row for a (voucher digits, cents) key takes that key's tally row
+    ranked (key demand of earlier successful groups + k). A group succeeds if every key it needs
+    still has enough tally rows; since failed groups consume nothing, success is resolved as a
+    fixpoint over cumulative demand, which settles at least one more group per pass.
+    """
+    tally_df['tally_uid'] = tally_df['tally_uid'].astype(str)
+    tally_df = tally_df.reset_index(drop=True)
+    bf_df = bf_df.reset_index(drop=True)
+
+    tally = pd.DataFrame({
+        'vch': _voucher_digits(tally_df['T_Vch_No']).to_numpy(),
+        'amt': to_cents(tally_df['T_Credit']).to_numpy(),
+        'tally_pos': np.arange(len(tally_df)),
+    }).dropna(subset=['amt'])
+    tally['rank'] = tally.groupby(['vch', 'amt']).cumcount()
+
+    rows = pd.DataFrame({
+        'grp': bf_df.groupby('bf_match_id').ngroup().to_numpy(),
+        'source': bf_df['bf_source'].str.lower().to_numpy(),
+        'pos': np.arange(len(bf_df)),
+    })
+    rows = rows[(rows['grp'] >= 0) & rows['source'].isin(['bank', 'finance'])]
+    bank = rows[rows['source'] == 'bank']
+    fin = rows[rows['source'] == 'finance'].copy()
+    fin['vch'] = _voucher_digits(bf_df['F_Voucher_No']).to_numpy()[fin['pos']]
+    fin['amt'] = to_cents(bf_df['F_Credit_Amount']).to_numpy()[fin['pos']]
+
+    # Groups that can pass the totals check: one bank row, finance rows with amounts summing to it
+    groups = pd.DataFrame({
+        'n_bank': bank.groupby('grp').size(),
+        'bank_pos': bank.groupby('grp')['pos'].first(),
+        'n_fin': fin.groupby('grp').size(),
+        'n_fin_amt': fin.groupby('grp')['amt'].count(),
+        'fin_sum': fin.groupby('grp')['amt'].sum(),
+    })
+    groups = groups[(groups['n_bank'] == 1) & (groups['n_fin'] >= 1) & (groups['n_fin_amt'] == groups['n_fin'])]
+    if groups.empty:
+        return pd.DataFrame()
+    groups['bank_amt'] = _get_bank_amounts(bf_df).to_numpy()[groups['bank_pos'].astype(np.int64)]
+    groups = groups[groups['fin_sum'] == groups['bank_amt']]
+    fin = fin[fin['grp'].isin(groups.index)].copy()
+    if fin.empty:
+        return pd.DataFrame()
+    fin['occurrence'] = fin.groupby(['grp', 'vch', 'amt']).cumcount()
+
+    # Demand per (group, key) in group order, against the number of tally rows per key
+    demand = fin.groupby(['grp', 'vch', 'amt']).size().rename('need').reset_index()
+    supply = tally.groupby(['vch', 'amt']).size().rename('supply').reset_index()
+    demand = demand.merge(supply, on=['vch', 'amt'], how='left').fillna({'supply': 0})
+    demand = demand.sort_values('grp', kind='stable').reset_index(drop=True)
+    key_codes = demand.groupby(['vch', 'amt']).ngroup()
+
+    group_ok = pd.Series(True, index=groups.index)
+    while True:
+        taken = demand['need'] * demand['grp'].map(group_ok).to_numpy()
+        demand['before'] = taken.groupby(key_codes).cumsum() - taken
+        row_ok = demand['before'] + demand['need'] <= demand['supply']
+        new_ok = row_ok.groupby(demand['grp']).all().reindex(groups.index, fill_value=True)
+        if new_ok.equals(group_ok):
+            break
+        group_ok = new_ok
+
+    ok_groups = group_ok[group_ok].index
+    if len(ok_groups) == 0:
+        return pd.DataFrame()
+    fin = fin[fin['grp'].isin(ok_groups)]
+    fin = fin.merge(demand[['grp', 'vch', 'amt', 'before']], on=['grp', 'vch', 'amt'], how='left')
+    fin['rank'] = fin['before'] + fin['occurrence']
+    fin = fin.merge(tally[['vch', 'amt', 'rank', 'tally_pos']], on=['vch', 'amt', 'rank'], how='left')
+    fin = fin.sort_values('pos', kind='stable')
+
+    # One output row per bank, finance and tally row, ordered group by group
+    groups = groups.loc[ok_groups]
+    counter = np.arange(1, len(groups) + 1)
+    id_prefix = f"BFTM_{run_tag}_" if run_tag else "BFTM_"
+    match_id = pd.Series([f"{id_prefix}{n:04d}" for n in counter], index=groups.index)
+    match_type = pd.Series([f"1 to {n} to {n}" for n in groups['n_fin']], index=groups.index)
+    out = pd.concat([
+        pd.DataFrame({'grp': groups.index, 'part': 0, 'source': 'Bank', 'pos': groups['bank_pos'].to_numpy()}),
+        pd.DataFrame({'grp': fin['grp'], 'part': 1, 'source': 'Finance', 'pos': fin['pos']}),
+        pd.DataFrame({'grp': fin['grp'], 'part': 2, 'source': 'Tally', 'pos': fin['tally_pos']}),
+    ], ignore_index=True).sort_values(['grp', 'part'], kind='stable')
+    return _assemble_bft_matches(
+        bf_df, tally_df, match_id[out['grp']].to_numpy(), match_type[out['grp']].to_numpy(),
+        out['source'].to_numpy(), out['pos'].to_numpy())
+
+
+# Engines selectable from /reconcile_bft
+BFT_ENGINES = {
+    'loop': bank_fin_tally_match,
+    'join': bank_fin_tally_match_join,
+}
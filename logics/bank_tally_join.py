@@ -0,0 +1,132 @@
+# logics/bank_tally_join.py
+
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils.money import column_cents
+
+
+# Cheque-ref patterns shared by the MDB and MTB rule sets (and the MTB EFT vendor extraction)
+
+def prefix_pattern(prefix, min_digits):
+    """Digits, dashes and spaces following `prefix` (case-insensitive), as group 1."""
+    return re.compile(rf"{re.escape(prefix)}([\d\- ]{{{min_digits},}})", re.IGNORECASE)
+
+
+def nth_segment_pattern(n):
+    """Group 1 is [seg for seg in text.split('/') if seg.strip()][n], when there is one."""
+    return re.compile(rf"^(?:\s*/)*(?:\s*[^\s/][^/]*/(?:\s*/)*){{{n}}}(\s*[^\s/][^/]*)")
+
+
+def fill_missing_refs(df, narration_col, extract):
+    """
+    cheque_ref as stored at upload, extracting it only for rows without one (NULL: uploaded
+    before the column existed). '' stays '': the narration was checked and has no ref.
+    """
+    if 'cheque_ref' not in df.columns:
+        return extract(df[narration_col])
+    refs = df['cheque_ref'].astype(object)
+    missing = refs.isna()
+    if missing.any():
+        refs = refs.copy()
+        refs[missing] = extract(df.loc[missing, narration_col]).astype(object)
+    return refs
+
+
+def _side_keys(df, ref_col, amount_cols):
+    """
+    One row per (position, direction) where the amount for that direction is non-zero:
+    columns pos, ref, dir, amt. Rows without a cheque ref are left out.
+    """
+    refs = df[ref_col].to_numpy(dtype=object)
+    has_ref = pd.Series(refs).notna().to_numpy() & (refs != '')
+    parts = []
+    for direction, col in amount_cols.items():
+        amounts = column_cents(df, col).to_numpy()
+        keep = has_ref & (amounts != 0)
+        parts.append(pd.DataFrame({
+            'pos': np.flatnonzero(keep), 'ref': refs[keep], 'dir': direction, 'amt': amounts[keep],
+        }))
+    return pd.concat(parts, ignore_index=True).sort_values('pos', kind='stable')
+
+
+def _greedy_pairs(bank_keys, tally_keys):
+    """
+    Bank rows in order each take the earliest unused tally row under any of their keys.
+    Queues hold tally positions per key in ledger order; used rows are dropped lazily.
+    """
+    queues = {}
+    for t_pos, key in zip(tally_keys['pos'], zip(tally_keys['ref'], tally_keys['dir'], tally_keys['amt'])):
+        queues.setdefault(key, deque()).append(t_pos)
+    bank_rows = {}
+    for b_pos, key in zip(bank_keys['pos'], zip(bank_keys['ref'], bank_keys['dir'], bank_keys['amt'])):
+        bank_rows.setdefault(b_pos, []).append(key)
+    used_tally, picked = set(), []
+    for b_pos in sorted(bank_rows):
+        heads = []
+        for key in bank_rows[b_pos]:
+            queue = queues.get(key)
+            while queue and queue[0] in used_tally:
+                queue.popleft()
+            if queue:
+                heads.append(queue[0])
+        if heads:
+            used_tally.add(min(heads))
+            picked.append((b_pos, min(heads)))
+    return pd.DataFrame(picked, columns=['bank_pos', 'tally_pos'], dtype=np.int64)
+
+
+def join_cheque_matches(bank_df, tally_df, bank_config, tally_config, start_id=1, run_tag=""):
+    """
+    Pair bank and tally rows that share a cheque_ref, where a bank withdrawal equals the tally
+    credit or a bank deposit equals the tally debit (in cents). Each bank row, in bank order, takes
+    the earliest unused eligible tally row.
+
+    Refs where no row has both directions are solved by rank: the k-th bank row of a
+    (ref, direction, amount) key gets the key's k-th tally row. Refs with two-sided rows go
+    through a greedy pass over per-key tally queues instead.
+    Returns the bt_matched rows (bank, tally, bank, tally, ...) as a DataFrame.
+    """
+    bank_keys = _side_keys(bank_df, 'cheque_ref', {
+        'W': bank_config['withdrawal_column'], 'D': bank_config['deposit_column']})
+    tally_keys = _side_keys(tally_df, 'cheque_ref', {
+        'W': tally_config['credit_column'], 'D': tally_config['debit_column']})
+
+    two_sided_refs = set(bank_keys.loc[bank_keys['pos'].duplicated(), 'ref']) | \
+        set(tally_keys.loc[tally_keys['pos'].duplicated(), 'ref'])
+    key_cols = ['ref', 'dir', 'amt']
+
+    simple_bank = bank_keys[~bank_keys['ref'].isin(two_sided_refs)].copy()
+    simple_tally = tally_keys[~tally_keys['ref'].isin(two_sided_refs)].copy()
+    simple_bank['rank'] = simple_bank.groupby(key_cols).cumcount()
+    simple_tally['rank'] = simple_tally.groupby(key_cols).cumcount()
+    ranked = simple_bank.merge(simple_tally, on=key_cols + ['rank'], suffixes=('_bank', '_tally'))
+
+    pairs = pd.concat([
+        ranked.rename(columns={'pos_bank': 'bank_pos', 'pos_tally': 'tally_pos'})[['bank_pos', 'tally_pos']],
+        _greedy_pairs(bank_keys[bank_keys['ref'].isin(two_sided_refs)],
+                      tally_keys[tally_keys['ref'].isin(two_sided_refs)]),
+    ], ignore_index=True).sort_values('bank_pos', kind='stable')
+    if pairs.empty:
+        return pd.DataFrame()
+
+    n = len(pairs)
+    match_ids = [
+        f"BTM_{run_tag}_{match_id:04d}" if run_tag else f"BTM_{match_id:04d}"
+        for match_id in range(start_id, start_id + n)
+    ]
+    parts = []
+    for frame, col, source in ((bank_df, 'bank_pos', 'Bank'), (tally_df, 'tally_pos', 'Tally')):
+        part = frame.iloc[pairs[col].to_numpy(dtype=np.int64)].reset_index(drop=True)
+        part['bt_match_id'] = match_ids
+        part['bt_source'] = source
+        parts.append(part)
+    bt_matched = pd.concat(parts, ignore_index=True)
+    # Interleave so each bank row is followed by its tally row
+    order = np.empty(2 * n, dtype=np.int64)
+    order[0::2] = np.arange(n)
+    order[1::2] = n + np.arange(n)
+    return bt_matched.take(order).reset_index(drop=True)
@@ -1,6 +1,8 @@
 # bank_tally_match_logic_mdb.py
 
-import re
+import pandas as pd
+
+from logics.bank_tally_join import fill_missing_refs, join_cheque_matches, nth_segment_pattern, prefix_pattern
 
 # --- Config for MDB bank extraction ---
 BANK_CONFIG = {
@@ -19,24 +21,44 @@ BANK_CONFIG = {
     ]
 }
 
-def extract_bank_cheque_ref(text):
-    text = str(text)
-    for p in BANK_CONFIG['prefixes']:
+def compile_bank_rules(prefixes):
+    """
+    Precompile BANK_CONFIG prefixes. Static prefixes capture the digits after the prefix; dynamic
+    prefixes take the nth non-blank '/' segment of narrations starting with the prefix.
+    """
+    rules = []
+    for p in prefixes:
         if "prefix" in p:
-            pattern = rf"{re.escape(p['prefix'])}([\d\- ]{{{p['min_digits']},}})"
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return re.sub(r'[\s,-]', '', match.group(1))
+            rules.append({"pattern": prefix_pattern(p["prefix"], p["min_digits"]), "startswith": None, "min_len": 0})
         elif "dynamic_prefix" in p:
-            if text.lower().startswith(p["dynamic_prefix"].lower()):
-                n, m = p["extract_between_nth_and_mth_slash"]
-                parts = [seg for seg in text.split("/") if seg.strip()]
-                if len(parts) > n:
-                    candidate = parts[n]
-                    value = re.sub(r'[\s,-]', '', candidate)
-                    if len(value) >= p['min_digits']:
-                        return value
-    return None
+            n = p["extract_between_nth_and_mth_slash"][0]
+            rules.append({"pattern": nth_segment_pattern(n), "startswith": p["dynamic_prefix"].lower(),
+                          "min_len": p["min_digits"]})
+    return rules
+
+_BANK_RULES = compile_bank_rules(BANK_CONFIG['prefixes'])
+
+def extract_bank_cheque_refs(narrations):
+    """
+    Cheque ref of every narration (None if no rule applies). Rules run in BANK_CONFIG order as one
+    str.extract pass each over the rows still unresolved, so the first rule that applies wins.
+    """
+    # astype(object): map() infers the pyarrow str dtype, where regexes run on RE2 rather than re
+    texts = pd.Series(narrations, dtype=object).map(str).astype(object)
+    refs = pd.Series([None] * len(texts), index=texts.index, dtype=object)
+    for rule in _BANK_RULES:
+        pending = texts[refs.isna()]
+        if rule["startswith"]:
+            pending = pending[pending.str.lower().str.startswith(rule["startswith"])]
+        if pending.empty:
+            continue
+        found = pending.str.extract(rule["pattern"], expand=False).dropna()
+        if found.empty:
+            continue
+        found = found.str.replace(r'[\s,-]', '', regex=True)
+        found = found[found.str.len() >= rule["min_len"]]
+        refs.loc[found.index] = found.astype(object)
+    return refs
 
 # --- Config for Tally extraction ---
 TALLY_CONFIG = {
@@ -56,56 +78,38 @@ TALLY_CONFIG = {
     ]
 }
 
-def extract_tally_cheque_ref(text):
-    text = str(text)
-    for p in TALLY_CONFIG['prefixes']:
-        pattern = rf"{re.escape(p['prefix'])}([\d\- ]{{{p['min_digits']},}})"
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return re.sub(r'[\-\s]', '', match.group(1))
-    return None
+_TALLY_PATTERNS = [prefix_pattern(p["prefix"], p["min_digits"]) for p in TALLY_CONFIG['prefixes']]
+
+def extract_tally_cheque_refs(narrations):
+    """Cheque ref of every narration (None if no prefix matches); the first prefix in TALLY_CONFIG order wins."""
+    # astype(object): map() infers the pyarrow str dtype, where regexes run on RE2 rather than re
+    texts = pd.Series(narrations, dtype=object).map(str).astype(object)
+    refs = pd.Series([None] * len(texts), index=texts.index, dtype=object)
+    for pattern in _TALLY_PATTERNS:
+        pending = texts[refs.isna()]
+        if pending.empty:
+            break
+        found = pending.str.extract(pattern, expand=False).dropna()
+        if found.empty:
+            continue
+        refs.loc[found.index] = found.str.replace(r'[\-\s]', '', regex=True).astype(object)
+    return refs
+
+def bank_refs(narrations):
+    """Stored bank_data.cheque_ref: the ref, or '' when the narration has none."""
+    return extract_bank_cheque_refs(narrations).fillna('')
+
+def tally_refs(narrations):
+    """Stored tally_data.cheque_ref: the ref, or '' when the narration has none."""
+    return extract_tally_cheque_refs(narrations).fillna('')
 
 # def match_cheques(bank_df, tally_df, start_id=1):
 def match_cheques(bank_df, tally_df, start_id=1, run_tag=""):
     bank_df = bank_df[bank_df['bf_is_matched'] == 0].copy()
     tally_df = tally_df[tally_df['bft_is_matched'] == 0].copy()
 
-    bank_df['cheque_ref'] = bank_df[BANK_CONFIG['narration_column']].apply(extract_bank_cheque_ref)
-    tally_df['cheque_ref'] = tally_df[TALLY_CONFIG['narration_column']].apply(extract_tally_cheque_ref)
-
-    matched = []
-    used_bank = set()
-    used_tally = set()
-    match_id = start_id
-
-    # Build map for quick lookup
-    tally_cheque_map = {}
-    for idx, row in tally_df.iterrows():
-        ref = row['cheque_ref']
-        if ref:
-            tally_cheque_map.setdefault(ref, []).append(idx)
-
-    for i, b_row in bank_df.iterrows():
-        ref = b_row['cheque_ref']
-        if not ref or i in used_bank:
-            continue
-        withdrawal = float(b_row.get(BANK_CONFIG['withdrawal_column'], 0) or 0)
-        deposit = float(b_row.get(BANK_CONFIG['deposit_column'], 0) or 0)
-        for j in tally_cheque_map.get(ref, []):
-            if j in used_tally:
-                continue
-            t_row = tally_df.loc[j]
-            tally_credit = float(t_row.get(TALLY_CONFIG['credit_column'], 0) or 0)
-            tally_debit = float(t_row.get(TALLY_CONFIG['debit_column'], 0) or 0)
-            if (withdrawal and withdrawal == tally_credit) or (deposit and deposit == tally_debit):
-                # match_id_str = f"BTM_{match_id:04d}"
-                match_id_str = f"BTM_{run_tag}_{match_id:04d}" if run_tag else f"BTM_{match_id:04d}"
-                matched.append({**b_row.to_dict(), 'bt_match_id': match_id_str, 'bt_source': 'Bank'})
-                matched.append({**t_row.to_dict(), 'bt_match_id': match_id_str, 'bt_source': 'Tally'})
-                used_bank.add(i)
-                used_tally.add(j)
-                match_id += 1
-                break
+    bank_df['cheque_ref'] = fill_missing_refs(bank_df, BANK_CONFIG['narration_column'], bank_refs)
+    tally_df['cheque_ref'] = fill_missing_refs(tally_df, TALLY_CONFIG['narration_column'], tally_refs)
 
-    # Return only matched pairs (bt_matched table)
-    return matched
+    # Join on (cheque_ref, amount in cents) per direction: withdrawal-credit, deposit-debit
+    return join_cheque_matches(bank_df, tally_df, BANK_CONFIG, TALLY_CONFIG, start_id=start_id, run_tag=run_tag)
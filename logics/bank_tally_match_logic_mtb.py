@@ -2,6 +2,10 @@
 
 import re
 
+import pandas as pd
+
+from logics.bank_tally_join import fill_missing_refs, join_cheque_matches, nth_segment_pattern, prefix_pattern
+
 # --- Config for MTB bank extraction ---
 BANK_CONFIG = {
     "narration_column": "B_Particulars",
@@ -27,39 +31,58 @@ BANK_CONFIG = {
     ]
 }
 
-def extract_cheque_ref(text, rule):
-    text = str(text)
-    if "extract_after_nth_slash" in rule:
-        n = rule["extract_after_nth_slash"]
-        parts = [s for s in text.split("/") if s.strip()]
-        if len(parts) > n:
-            text = parts[n]
-        else:
-            return None
-    min_digits = rule.get("min_digits", 5)
-    numbers = re.findall(rf"[\d,]{{{min_digits},}}", text)
-    nth = rule.get("extract_after_nth_number", 1)
-    if len(numbers) >= nth:
-        return re.sub(r'[,\s\-]', '', numbers[nth - 1])
-    return None
-
-def get_first_cheque_ref(text, prefixes):
+def compile_rules(prefixes):
+    """
+    Precompile a prefix list. Static prefixes capture the digits after the prefix; dynamic
+    prefixes take the nth number (optionally inside the nth '/' segment) anywhere in the text.
+    """
+    rules = []
     for p in prefixes:
         if "prefix" in p:
-            prefix = p["prefix"]
-            min_digits = p["min_digits"]
-            pattern = rf"{re.escape(prefix)}([\d\- ]{{{min_digits},}})"
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return re.sub(r'[\-\s]', '', match.group(1))
+            rules.append({"pattern": prefix_pattern(p["prefix"], p["min_digits"])})
         elif "dynamic_prefix" in p:
-            result = extract_cheque_ref(text, p)
-            if result:
-                return result
-    return None
+            min_digits = p.get("min_digits", 5)
+            rules.append({
+                "segment": nth_segment_pattern(p["extract_after_nth_slash"]) if "extract_after_nth_slash" in p else None,
+                "numbers": re.compile(rf"[\d,]{{{min_digits},}}"),
+                "nth": p.get("extract_after_nth_number", 1),
+            })
+    return rules
+
+def get_first_cheque_refs(narrations, rules):
+    """
+    Cheque ref of every narration (None if no rule applies). Rules run in order as one vectorized
+    pass each over the rows still unresolved, so the first rule that applies wins.
+    """
+    # astype(object): map() infers the pyarrow str dtype, where regexes run on RE2 rather than re
+    texts = pd.Series(narrations, dtype=object).map(str).astype(object)
+    refs = pd.Series([None] * len(texts), index=texts.index, dtype=object)
+    for rule in rules:
+        pending = texts[refs.isna()]
+        if pending.empty:
+            break
+        if "pattern" in rule:
+            found = pending.str.extract(rule["pattern"], expand=False).dropna()
+            if found.empty:
+                continue
+            found = found.str.replace(r'[\-\s]', '', regex=True)
+        else:
+            if rule["segment"] is not None:
+                pending = pending.str.extract(rule["segment"], expand=False).dropna()
+                if pending.empty:
+                    continue
+            found = pending.str.findall(rule["numbers"]).str[rule["nth"] - 1].dropna()
+            if found.empty:
+                continue
+            found = found.str.replace(r'[,\s\-]', '', regex=True)
+            found = found[found != '']
+        refs.loc[found.index] = found.astype(object)
+    return refs
 
-def extract_bank_cheque_ref(text):
-    return get_first_cheque_ref(text, BANK_CONFIG['prefixes'])
+_BANK_RULES = compile_rules(BANK_CONFIG['prefixes'])
+
+def extract_bank_cheque_refs(narrations):
+    return get_first_cheque_refs(narrations, _BANK_RULES)
 
 # --- Config for Tally extraction ---
 TALLY_CONFIG = {
@@ -79,18 +102,32 @@ TALLY_CONFIG = {
     ]
 }
 
-def extract_tally_cheque_ref(text):
-    return get_first_cheque_ref(text, TALLY_CONFIG['prefixes'])
+_TALLY_RULES = compile_rules(TALLY_CONFIG['prefixes'])
+
+def extract_tally_cheque_refs(narrations):
+    return get_first_cheque_refs(narrations, _TALLY_RULES)
 
-def normalize_ref(ref):
-    return ref.lstrip('0') if isinstance(ref, str) else ref
+def normalize_refs(refs):
+    """Drop leading zeros so '00123456' and '123456' compare equal."""
+    refs = refs.copy()
+    present = refs.notna()
+    refs[present] = refs[present].astype(str).str.lstrip('0').astype(object)
+    return refs
+
+def bank_refs(narrations):
+    """Stored bank_data.cheque_ref: the normalized ref, or '' when the narration has none."""
+    return normalize_refs(extract_bank_cheque_refs(narrations)).fillna('')
+
+def tally_refs(narrations):
+    """Stored tally_data.cheque_ref: the normalized ref, or '' when the narration has none."""
+    return normalize_refs(extract_tally_cheque_refs(narrations)).fillna('')
 
 # def match_cheques(bank_df, tally_df, start_id=1):
 def match_cheques(bank_df, tally_df, start_id=1, run_tag=""):
 
     """
     MTB cheque matching: only unmatched (is_matched == 0) rows.
-    Returns bt_matched table as a list of dicts.
+    Returns the bt_matched rows as a DataFrame.
     """
     # Filter for unmatched only
     # bank_df = bank_df[bank_df['is_matched'] == 0].copy()
@@ -98,41 +135,8 @@ def match_cheques(bank_df, tally_df, start_id=1, run_tag=""):
     bank_df = bank_df[bank_df['bf_is_matched'] == 0].copy()
     tally_df = tally_df[tally_df['bft_is_matched'] == 0].copy()
 
-    bank_df['cheque_ref'] = bank_df[BANK_CONFIG['narration_column']].apply(extract_bank_cheque_ref).apply(normalize_ref)
-    tally_df['cheque_ref'] = tally_df[TALLY_CONFIG['narration_column']].apply(extract_tally_cheque_ref).apply(normalize_ref)
-
-    matched = []
-    used_bank = set()
-    used_tally = set()
-    match_id = start_id
-
-    tally_cheque_map = {}
-    for idx, row in tally_df.iterrows():
-        ref = row['cheque_ref']
-        if ref:
-            tally_cheque_map.setdefault(ref, []).append(idx)
-
-    for i, b_row in bank_df.iterrows():
-        ref = b_row['cheque_ref']
-        if not ref or i in used_bank:
-            continue
-        withdrawal = float(b_row.get(BANK_CONFIG['withdrawal_column'], 0) or 0)
-        deposit = float(b_row.get(BANK_CONFIG['deposit_column'], 0) or 0)
-        for j in tally_cheque_map.get(ref, []):
-            if j in used_tally:
-                continue
-            t_row = tally_df.loc[j]
-            tally_credit = float(t_row.get(TALLY_CONFIG['credit_column'], 0) or 0)
-            tally_debit = float(t_row.get(TALLY_CONFIG['debit_column'], 0) or 0)
-            if (withdrawal and withdrawal == tally_credit) or (deposit and deposit == tally_debit):
-                # match_id_str = f"BTM_{match_id:04d}"
-                match_id_str = f"BTM_{run_tag}_{match_id:04d}" if run_tag else f"BTM_{match_id:04d}"
-
-                matched.append({**b_row.to_dict(), 'bt_match_id': match_id_str, 'bt_source': 'Bank'})
-                matched.append({**t_row.to_dict(), 'bt_match_id': match_id_str, 'bt_source': 'Tally'})
-                used_bank.add(i)
-                used_tally.add(j)
-                match_id += 1
-                break
-
-    return matched
+    bank_df['cheque_ref'] = fill_missing_refs(bank_df, BANK_CONFIG['narration_column'], bank_refs)
+    tally_df['cheque_ref'] = fill_missing_refs(tally_df, TALLY_CONFIG['narration_column'], tally_refs)
+
+    # Join on (cheque_ref, amount in cents) per direction: withdrawal-credit, deposit-debit
+    return join_cheque_matches(bank_df, tally_df, BANK_CONFIG, TALLY_CONFIG, start_id=start_id, run_tag=run_tag)
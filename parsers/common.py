@@ -0,0 +1,90 @@
+# parsers/common.py
+
+import numpy as np
+import pandas as pd
+
+# Header rows sit under a short metadata block; never scan further than this
+HEADER_SCAN_ROWS = 100
+
+
+def locate_header(df_raw, required, max_rows=HEADER_SCAN_ROWS, case_sensitive=True):
+    """
+    Index label of the first row, among the first `max_rows`, that has every name in `required`
+    as a (stripped) cell value, or None. Cells are compared in one vectorized pass.
+    """
+    cells = df_raw.iloc[:max_rows].stack().dropna().map(str).str.strip()
+    wanted = set(required)
+    if not case_sensitive:
+        cells = cells.str.lower()
+        wanted = {name.lower() for name in wanted}
+    hits = cells[cells.isin(wanted)]
+    if hits.empty:
+        return None
+    row_labels = hits.index.get_level_values(0)
+    found = pd.DataFrame({'row': row_labels, 'name': hits.to_numpy()}).drop_duplicates()
+    counts = found.groupby('row', sort=False).size()
+    complete = counts[counts == len(wanted)]
+    if complete.empty:
+        return None
+    # First complete row in sheet order
+    return df_raw.index[df_raw.index.isin(complete.index)][0]
+
+
+def slice_below_header(df_raw, header_idx):
+    """
+    The frame pd.read_excel(header=header_idx) would return, cut from a sheet already read with
+    header=None: the header row's values become column names (blank ones 'Unnamed: i', repeats
+    'name.1', 'name.2', ...) and the rows below it become the data.
+    """
+    header_pos = df_raw.index.get_loc(header_idx)
+    names, counts = [], {}
+    for i, val in enumerate(df_raw.iloc[header_pos].tolist()):
+        name = f"Unnamed: {i}" if pd.isna(val) else val
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        names.append(name)
+    data = df_raw.iloc[header_pos + 1:].reset_index(drop=True)
+    data.columns = names
+    return data
+
+
+def date_numbers(values):
+    """YYYYMMDD as a number for each date or date string; NaN where it does not parse."""
+    dates = pd.to_datetime(pd.Series(values), errors="coerce", format="mixed")
+    return dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+
+
+def hex_strings(numbers, missing="0", upper=False, hex_slice=False):
+    """
+    Hex text of whole numbers, with `missing` for NaN/inf. hex_slice mimics hex(v)[2:], which
+    renders -5 as 'x5' rather than '-5'. Each distinct value is formatted once.
+    """
+    values = pd.to_numeric(pd.Series(numbers), errors="coerce")
+    floats = values.to_numpy(dtype="float64", na_value=np.nan)
+    out = pd.Series(missing, index=values.index, dtype=object)
+    valid = np.isfinite(floats)
+    if valid.any():
+        ints = pd.Series(floats[valid].astype(np.int64), index=values.index[valid])
+        spec = "X" if upper else "x"
+        table = {}
+        for v in ints.unique().tolist():
+            text = format(v, spec)
+            table[v] = "x" + text[1:] if hex_slice and v < 0 else text
+        out[valid] = ints.map(table).to_numpy()
+    return out
+
+
+def row_numbers(labels, width):
+    """1-based row numbers from 0-based index labels, zero-padded to `width` digits."""
+    return pd.Series(np.asarray(labels) + 1, index=labels).astype(str).str.zfill(width)
+
+
+def build_uid(*parts):
+    """Join per-row parts with '_' into one UID per row; scalar parts repeat on every row."""
+    index = next(p.index for p in parts if isinstance(p, pd.Series))
+    cols = [p.astype(str) if isinstance(p, pd.Series) else pd.Series(str(p), index=index) for p in parts]
+    return cols[0].str.cat(cols[1:], sep="_")
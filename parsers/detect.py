@@ -0,0 +1,86 @@
+# parsers/detect.py
+
+from parsers.common import HEADER_SCAN_ROWS, locate_header
+from parsers.fin_parser import FIN_HEADERS, parse_fin_statement
+from parsers.mdb_parser import MDB_HEADERS, parse_mdb_statement
+from parsers.mtb_parser import MTB_HEADERS, parse_mtb_statement
+from parsers.readers import is_columnar, open_excel, read_sheet
+from parsers.tally_parser import TALLY_HEADERS, parse_tally_file
+
+# Upload kinds in detection order. Each is recognised by its header row; MDB statements are
+# read from the first sheet only, so that is the only sheet they are looked for on. "sheet" gives
+# the sheet argument the parser is called with, which is also what parse caches are keyed on.
+UPLOAD_KINDS = {
+    "tally": {
+        "table": "tally_data",
+        "headers": TALLY_HEADERS,
+        "case_sensitive": True,
+        "first_sheet_only": False,
+        "sheet": lambda sheet: sheet,
+        "parse": lambda path, sheet: parse_tally_file(path, sheet),
+    },
+    "MTB": {
+        "table": "bank_data",
+        "headers": MTB_HEADERS,
+        "case_sensitive": True,
+        "first_sheet_only": False,
+        "sheet": lambda sheet: sheet or "AcStatementReport",
+        "parse": lambda path, sheet: parse_mtb_statement(path, sheet),
+    },
+    "MDB": {
+        "table": "bank_data",
+        "headers": MDB_HEADERS,
+        "case_sensitive": False,
+        "first_sheet_only": True,
+        "sheet": lambda sheet: None,
+        "parse": lambda path, sheet: parse_mdb_statement(path),
+    },
+    "finance": {
+        "table": "fin_data",
+        "headers": FIN_HEADERS,
+        "case_sensitive": True,
+        "first_sheet_only": False,
+        "sheet": lambda sheet: sheet,
+        "parse": lambda path, sheet: parse_fin_statement(path, sheet_name=sheet),
+    },
+}
+
+
+def _header_scans(path, sheet_name):
+    """(sheet, first HEADER_SCAN_ROWS rows) of each candidate sheet, opening the workbook once."""
+    if is_columnar(path):
+        yield sheet_name, read_sheet(path, nrows=HEADER_SCAN_ROWS)
+        return
+    with open_excel(path) as xls:
+        if sheet_name and sheet_name not in xls.sheet_names:
+            raise ValueError(f"Sheet '{sheet_name}' not found.")
+        for sheet in [sheet_name] if sheet_name else xls.sheet_names:
+            yield sheet, xls.parse(sheet, dtype=str, header=None, nrows=HEADER_SCAN_ROWS)
+
+
+def detect_upload(path, sheet_name=None):
+    """
+    (kind, sheet_name) of an uploaded statement or ledger, from the header row found in the
+    first HEADER_SCAN_ROWS rows. Without a sheet_name every sheet is tried in workbook order.
+    Detection is a second read of the file: parse_upload reads it again in full, so callers that
+    already know the kind should skip this.
+    """
+    for pos, (sheet, top) in enumerate(_header_scans(path, sheet_name)):
+        for kind, spec in UPLOAD_KINDS.items():
+            if spec["first_sheet_only"] and sheet_name is None and pos > 0:
+                continue
+            if locate_header(top, spec["headers"], case_sensitive=spec["case_sensitive"]) is not None:
+                return kind, sheet
+    raise ValueError("Could not tell which statement this is: no known header row found.")
+
+
+def parser_sheet(kind, sheet_name=None):
+    """The sheet argument the parser of `kind` receives for `sheet_name` (None: its default)."""
+    if kind not in UPLOAD_KINDS:
+        raise ValueError(f"Unknown upload kind '{kind}'.")
+    return UPLOAD_KINDS[kind]["sheet"](sheet_name)
+
+
+def parse_upload(path, kind, sheet_name=None):
+    """Parse with the parser of `kind` (a key of UPLOAD_KINDS)."""
+    return UPLOAD_KINDS[kind]["parse"](path, parser_sheet(kind, sheet_name))
@@ -1,45 +1,29 @@
+import numpy as np
 import pandas as pd
-import re
-import string
 
+from parsers.common import build_uid, date_numbers, hex_strings, locate_header, row_numbers, slice_below_header
+from parsers.readers import read_sheet
+from parsers.vendors import fin_vendors
 
-def derive_vendor(name):
-    if not isinstance(name, str):
-        return ""
-    name = name.upper().strip()
-    name = re.sub(r"^(M[\s\.\/]*S[\s\.]*)", "", name)
-    name = re.sub(rf"[{re.escape(string.punctuation)}]", "", name)
-    name = name.replace(" ", "")
-    return name
+FIN_HEADERS = [
+    "Routing No", "Receiving A/C No", "Credit Amount", "Receiver Name",
+    "Bank Name", "Branch Name", "Sender Name", "Sender Account", "Sender Bank",
+    "Unit Name", "Team Name", "New Project", "Project", "Sub Project", "PO",
+    "Status", "Voucher Date", "Voucher No", "Payment Date", "Payment Month",
+    "Remarks", "Mark", "Concern"
+]
 
 
 def parse_fin_statement(input_file, sheet_name=None, payment_month=None):
-    expected_header = [
-        "Routing No", "Receiving A/C No", "Credit Amount", "Receiver Name",
-        "Bank Name", "Branch Name", "Sender Name", "Sender Account", "Sender Bank",
-        "Unit Name", "Team Name", "New Project", "Project", "Sub Project", "PO",
-        "Status", "Voucher Date", "Voucher No", "Payment Date", "Payment Month",
-        "Remarks", "Mark", "Concern"
-    ]
+    expected_header = FIN_HEADERS
 
-    with pd.ExcelFile(input_file) as xl:
-        if sheet_name is None:
-            sheet_name = xl.sheet_names[0]
+    df_all = read_sheet(input_file, sheet_name)
 
-        df_all = xl.parse(sheet_name, header=None, dtype=str)
+    header_row_idx = locate_header(df_all, expected_header)
+    if header_row_idx is None:
+        raise ValueError("Expected finance header row not found.")
 
-        header_row_idx = None
-        for idx, row in df_all.iterrows():
-            row_vals = [str(c).strip() for c in row.tolist()]
-            if all(col in row_vals for col in expected_header):
-                header_row_idx = idx
-                break
-
-        if header_row_idx is None:
-            raise ValueError("Expected finance header row not found.")
-
-        df = pd.read_excel(input_file, sheet_name=sheet_name,
-                           header=header_row_idx, dtype=str)
+    df = slice_below_header(df_all, header_row_idx)
 
     if payment_month and "Payment Month" in df.columns:
         df = df[df["Payment Month"] == payment_month]
@@ -58,29 +42,15 @@ def parse_fin_statement(input_file, sheet_name=None, payment_month=None):
                 df[dcol], errors="coerce").dt.strftime("%Y-%m-%d")
 
     if "Receiver Name" in df.columns:
-        df["fin_ven"] = df["Receiver Name"].apply(derive_vendor)
+        df["fin_ven"] = fin_vendors(df["Receiver Name"])
 
-    fin_uids = []
+    # F_<bank>_<HEX yyyymmdd>_<HEX whole amount>_<row number>
     bank = df["Sender Bank"].iloc[0] if "Sender Bank" in df.columns else "UNKNOWN"
-    for idx, row in df.iterrows():
-        rownum = str(idx + 1).zfill(6)
-        payment_date_str = row.get("Payment Date", "")
-        try:
-            payment_dt = pd.to_datetime(payment_date_str)
-            yyyymmdd = payment_dt.strftime("%Y%m%d")
-            hexdate = format(int(yyyymmdd), "X")
-        except Exception:
-            hexdate = "UNKNOWN"
-        try:
-            amount = float(row.get("Credit Amount", 0))
-            amount_int = int(amount)
-            hexamount = format(amount_int, "X")
-        except Exception:
-            hexamount = "UNKNOWN"
-        uid = f"F_{bank}_{hexdate}_{hexamount}_{rownum}"
-        fin_uids.append(uid)
-
-    df.insert(0, "fin_uid", fin_uids)
+    payment_dates = df["Payment Date"] if "Payment Date" in df.columns else pd.Series(None, index=df.index)
+    amounts = df["Credit Amount"] if "Credit Amount" in df.columns else pd.Series(0, index=df.index)
+    hexdate = hex_strings(date_numbers(payment_dates), missing="UNKNOWN", upper=True)
+    hexamount = hex_strings(np.trunc(pd.to_numeric(amounts, errors="coerce")), missing="UNKNOWN", upper=True)
+    df.insert(0, "fin_uid", build_uid(f"F_{bank}", hexdate, hexamount, row_numbers(df.index, 6)))
 
     df = df.rename(columns={
         "Routing No": "F_Routing_No",
@@ -4,24 +4,26 @@ import pandas as pd
 import re
 from calendar import month_name
 
+from logics.bank_tally_match_logic_mdb import bank_refs
+from parsers.common import build_uid, date_numbers, hex_strings, locate_header, row_numbers, slice_below_header
+from parsers.readers import read_sheet
+from parsers.vendors import mdb_bank_vendors
+
 MDB_ACCOUNT_NUMBERS = {
     "0011-1050011026",
     "0011-1060000331",
     # Add all valid Midland Bank account numbers here
 }
 
+MDB_HEADERS = ["Date", "Particular", "Withdrawal", "Deposit", "Balance"]
+
 
 def parse_mdb_statement(input_file):
-    header_cols = ["Date", "Particular", "Withdrawal", "Deposit", "Balance"]
-    df_all = pd.read_excel(input_file, header=None, dtype=str)
+    header_cols = MDB_HEADERS
+    df_all = read_sheet(input_file)
 
     # Find header row
-    header_row_idx = None
-    for idx, row in df_all.iterrows():
-        vals = [str(x).strip().lower() for x in row.tolist()]
-        if all(col.lower() in vals for col in header_cols):
-            header_row_idx = idx
-            break
+    header_row_idx = locate_header(df_all, header_cols, case_sensitive=False)
     if header_row_idx is None:
         raise Exception("Header row with expected columns not found.")
 
@@ -78,7 +80,7 @@ def parse_mdb_statement(input_file):
         statement_year = str(first_date.year)
 
     # Parse and clean transaction data
-    df_data = pd.read_excel(input_file, header=header_row_idx, dtype=str)
+    df_data = slice_below_header(df_all, header_row_idx)
     df_data = df_data[header_cols]
     df_data = df_data.dropna(how='all')
 
@@ -110,98 +112,12 @@ def parse_mdb_statement(input_file):
         df_data[col] = pd.to_numeric(df_data[col], errors="coerce").round(2)
 
     # Vendor extraction
-    def normalize_vendor_name(name):
-        s = str(name)
-        s = s.strip()
-        s = re.sub(r'^M[\s./\\-]*S[\s./\\-]*', '', s, flags=re.IGNORECASE)
-        s = s.replace(".", "").replace(" ", "").replace("-", "")
-        return s.upper()
-
-    def extract_bank_ven(row):
-        p = str(row["Particular"]).strip()
-
-        def get_between_slashes(text, end_from_right):
-            slashes = [m.start() for m in re.finditer("/", text)]
-            if len(slashes) < (end_from_right + 1):
-                return ""
-            start = slashes[0] + 1
-            end = slashes[-end_from_right]
-            return text[start:end].strip()
-        if p.lower().startswith("rtgs rtgs outward"):
-            vendor_raw = get_between_slashes(p, 6)
-            return normalize_vendor_name(vendor_raw)
-        if p.lower().startswith("rtgs rtgs inward"):
-            vendor_raw = get_between_slashes(p, 5)
-            return normalize_vendor_name(vendor_raw)
-        if p.lower().startswith("charge rtgs charge"):
-            vendor_raw = get_between_slashes(p, 6)
-            return normalize_vendor_name(vendor_raw)
-        if p.lower().startswith("clg hv"):
-            vendor_raw = get_between_slashes(p, 4)
-            return normalize_vendor_name(vendor_raw)
-        sl = [m.start() for m in re.finditer("/", p)]
-        if p.lower().startswith("transfer beftn outward") and len(sl) >= 4:
-            start = sl[2] + 1
-            end = sl[3]
-            vendor_raw = p[start:end].strip()
-            return normalize_vendor_name(vendor_raw)
-        if re.match(r'^CLG- InwardCA\d{7} RV', p, re.IGNORECASE):
-            idx = p.lower().find("pay to :")
-            if idx != -1:
-                after_payto = p[idx + len("pay to :"):].strip()
-                vendor_part = after_payto.split("/")[0].strip()
-                return normalize_vendor_name(vendor_part)
-        if p.lower().startswith("on-line cashca"):
-            match = re.match(r'on-line cashca(\d{7})', p, re.IGNORECASE)
-            if match:
-                end_digits = match.end()
-                next_slash = p.find("/", end_digits)
-                if next_slash != -1:
-                    vendor_portion = p[end_digits:next_slash].strip()
-                else:
-                    vendor_portion = p[end_digits:].strip()
-                for drop_phrase in ["Number of Tran. exceeded TP.", "No. of Tran. exceeded TP."]:
-                    vendor_portion = vendor_portion.split(drop_phrase)[
-                        0].strip()
-                return normalize_vendor_name(vendor_portion)
-        elif p.lower().startswith("on-line cash"):
-            remainder = p[len("On-Line Cash"):].strip()
-            if "/" in remainder:
-                vendor_part = remainder.split("/")[0].strip()
-                return normalize_vendor_name(remainder)
-            else:
-                return normalize_vendor_name(remainder)
-        return ""
-
-    df_data["bank_ven"] = df_data.apply(extract_bank_ven, axis=1)
-
-    # UID logic
-    def to_hex_date(date_str):
-        try:
-            dt = pd.to_datetime(date_str, errors="coerce")
-            if pd.isna(dt):
-                return "0"
-            ymd = dt.strftime("%Y%m%d")
-            return format(int(ymd), "x")
-        except Exception:
-            return "0"
-
-    def to_hex_balance(balance):
-        try:
-            bal = float(balance)
-            bal_int = int(round(bal))
-            return format(bal_int, "x")
-        except Exception:
-            return "0"
-
-    uid_list = []
-    for idx, row in df_data.iterrows():
-        row_num = str(idx + 1).zfill(6)
-        hex_date = to_hex_date(row.get("Date", ""))
-        hex_balance = to_hex_balance(row.get("Balance", 0))
-        uid = f"B_MDB_{hex_date}_{hex_balance}_{row_num}"
-        uid_list.append(uid)
-    df_data.insert(0, "bank_uid", uid_list)
+    df_data["bank_ven"] = mdb_bank_vendors(df_data["Particular"])
+
+    # UID logic: B_MDB_<hex yyyymmdd>_<hex rounded balance>_<row number>
+    hex_date = hex_strings(date_numbers(df_data["Date"]), missing="0")
+    hex_balance = hex_strings(pd.to_numeric(df_data["Balance"], errors="coerce").round(), missing="0")
+    df_data.insert(0, "bank_uid", build_uid("B_MDB", hex_date, hex_balance, row_numbers(df_data.index, 6)))
 
     # Insert account number statement_month and statement_year columns
     df_data["acct_no"] = account_number.replace("-", "") # Remove dashes from account number
@@ -220,4 +136,7 @@ def parse_mdb_statement(input_file):
         "Balance": "B_Balance"
     })
 
+    # Cheque ref for bank-tally matching, stored so it is not re-extracted on every run
+    df_data["cheque_ref"] = bank_refs(df_data["B_Particulars"])
+
     return df_data
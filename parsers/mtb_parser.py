@@ -4,63 +4,21 @@ import pandas as pd
 import re
 from calendar import month_name
 
+from logics.bank_tally_match_logic_mtb import bank_refs
+from parsers.common import build_uid, date_numbers, hex_strings, locate_header, row_numbers
+from parsers.readers import read_sheet
+from parsers.vendors import mtb_bank_vendors
+
 MTB_ACCOUNT_NUMBERS = {
     "0020320004355",  # add more MTB account numbers if needed
 }
 
-# --- Helper Function 1: Extract Bank Vendor ---
-def extract_bank_vendor(detail):
-    """
-    Extracts the vendor name from the 'Transaction Detail' column.
-    Removes unnecessary characters and standardizes the format.
-    """
-    if not isinstance(detail, str):
-        return ""
-    text = ' '.join(detail.split()).strip()
-    vendor = ""
-    
-    if text.startswith("RTGS/MTB"):
-        parts = text.split('/')
-        if len(parts) >= 3:
-            vendor = ' '.join(parts[2:-1]).strip()
-    elif text.startswith("EFT OCE"):
-        parts = [p.strip() for p in text.split('/') if p.strip()]
-        if len(parts) >= 4:
-            vendor = parts[3]
-    
-    # Clean unwanted patterns and spaces
-    vendor = re.sub(r"\bM[\.\s/\\]*S\b", "", vendor, flags=re.IGNORECASE)
-    vendor = vendor.replace(".", "").replace(" ", "")
-    
-    return vendor.upper().strip()
-
-# --- Helper Function 2: Convert Date to Hex ---
-def to_hex_date(date_str):
-    """
-    Converts a date string into a hexadecimal format (YYYYMMDD -> hex).
-    """
-    try:
-        dt = pd.to_datetime(date_str, errors="coerce")
-        if pd.isna(dt):
-            return "0"
-        ymd = dt.strftime("%Y%m%d")
-        return format(int(ymd), "x")
-    except Exception:
-        return "0"
-
-# --- Helper Function 3: Convert Balance to Hex ---
-def to_hex_balance(balance):
-    """
-    Converts a numeric balance into a hexadecimal format.
-    """
-    try:
-        bal = float(balance)
-        bal_int = int(round(bal))
-        return format(bal_int, "x")
-    except Exception:
-        return "0"
+MTB_HEADERS = [
+    "Date", "Transaction Detail", "Ref/Cheque No", "Withdrawal (Dr.)",
+    "Deposit (Cr.)", "Balance", "Branch"
+]
 
-# --- Helper Function 4: Extract Account Number ---
+# --- Helper Function 1: Extract Account Number ---
 def extract_account_number(metadata):
     """
     Extracts the account number from the metadata.
@@ -78,7 +36,7 @@ def extract_account_number(metadata):
     
     return account_number
 
-# --- Helper Function 5: Extract Statement Period ---
+# --- Helper Function 2: Extract Statement Period ---
 def extract_statement_period(metadata):
     """
     Extracts the statement period from the metadata.
@@ -110,29 +68,12 @@ def parse_mtb_statement(file_path, sheet_name="AcStatementReport"):
     """
     Main function to parse the MTB statement and clean the data.
     """
-    # Read the Excel file (all sheets)
-    if file_path.lower().endswith(".xlsx"):
-        df = pd.read_excel(file_path, sheet_name=None, dtype=str)
-    else:
-        df = pd.read_excel(file_path, sheet_name=None,
-                           dtype=str, engine="xlrd")
-    
-    # Find the relevant sheet
-    if sheet_name not in df:
-        raise ValueError(f"Sheet '{sheet_name}' not found.")
-    df_raw = df[sheet_name]
+    # Read only the statement sheet (xlrd is opened on demand, so other sheets stay undecoded)
+    df_raw = read_sheet(file_path, sheet_name, header=0)
 
     # Find header row (where required headers are found)
-    headers_required = [
-        "Date", "Transaction Detail", "Ref/Cheque No", "Withdrawal (Dr.)",
-        "Deposit (Cr.)", "Balance", "Branch"
-    ]
-    header_row_index = None
-    for i, row in df_raw.iterrows():
-        row_clean = row.fillna("").astype(str).str.strip().tolist()
-        if all(col in row_clean for col in headers_required):
-            header_row_index = i
-            break
+    headers_required = MTB_HEADERS
+    header_row_index = locate_header(df_raw, headers_required)
     if header_row_index is None:
         raise ValueError("Required headers not found.")
 
@@ -144,7 +85,7 @@ def parse_mtb_statement(file_path, sheet_name="AcStatementReport"):
     df_clean = df_clean[headers_required]
 
     # Clean data (strip spaces, replace NaN with empty string)
-    df_clean = df_clean.applymap(lambda x: str(x).strip() if pd.notna(x) else "")
+    df_clean = df_clean.apply(lambda col: col.str.strip()).fillna("")
 
     # Clean and format the "Date" column
     if "Date" in df_clean.columns:
@@ -160,18 +101,12 @@ def parse_mtb_statement(file_path, sheet_name="AcStatementReport"):
             df_clean[col] = pd.to_numeric(df_clean[col], errors="coerce").round(2)
 
     # Extract vendor information from "Transaction Detail"
-    df_clean["bank_ven"] = df_clean["Transaction Detail"].apply(lambda x: extract_bank_vendor(x))
+    df_clean["bank_ven"] = mtb_bank_vendors(df_clean["Transaction Detail"])
 
     # Generate unique IDs based on the transaction row and balance
-    uid_prefix = "B_MTB"
-    uid_list = []
-    for idx, row in df_clean.iterrows():
-        row_num = str(idx + 1).zfill(6)
-        hex_date = to_hex_date(row.get("Date", ""))
-        hex_balance = to_hex_balance(row.get("Balance", 0))
-        uid = f"{uid_prefix}_{hex_date}_{hex_balance}_{row_num}"
-        uid_list.append(uid)
-    df_clean.insert(0, "bank_uid", uid_list)
+    hex_date = hex_strings(date_numbers(df_clean["Date"]), missing="0")
+    hex_balance = hex_strings(pd.to_numeric(df_clean["Balance"], errors="coerce").round(), missing="0")
+    df_clean.insert(0, "bank_uid", build_uid("B_MTB", hex_date, hex_balance, row_numbers(df_clean.index, 6)))
 
     # Extract account number from metadata
     account_number = extract_account_number(metadata)
@@ -212,5 +147,8 @@ def parse_mtb_statement(file_path, sheet_name="AcStatementReport"):
     # Add the 'bank_code' column (MTB for Mutual Trust Bank)
     df_clean['bank_code'] = 'MTB'  # You can change this if needed
 
+    # Cheque ref for bank-tally matching, stored so it is not re-extracted on every run
+    df_clean["cheque_ref"] = bank_refs(df_clean["B_Particulars"])
+
     
     return df_clean
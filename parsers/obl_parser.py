@@ -2,31 +2,14 @@
 
 import pandas as pd
 
-def generate_uid(rownum, date_val, balance_val):
-    bank_code = "OBL"
-    rownum_str = f"{rownum:03d}"
-    try:
-        ymd = pd.to_datetime(str(date_val)).strftime("%Y%m%d")
-        hex_date = hex(int(ymd))[2:] if pd.notnull(date_val) else "0"
-    except Exception:
-        hex_date = "0"
-    try:
-        bal_int = int(round(float(str(balance_val).replace(",", ""))))
-        hex_balance = hex(bal_int)[2:] if pd.notnull(balance_val) else "0"
-    except Exception:
-        hex_balance = "0"
-    return f"{bank_code}_{rownum_str}_{hex_date}_{hex_balance}"
+from parsers.common import build_uid, date_numbers, hex_strings, locate_header, row_numbers, slice_below_header
+from parsers.readers import read_sheet
 
 def parse_obl_statement(file_path):
-    df_raw = pd.read_excel(file_path, dtype=str, header=None)
+    df_raw = read_sheet(file_path)
     target_headers = ["Tran Date", "Tran Type", "Reference No",
                       "Value Date", "Debit", "Credit", "Balance"]
-    header_row_idx = None
-    for idx, row in df_raw.iterrows():
-        row_vals = [str(x).strip().lower() for x in row.tolist()]
-        if all(h.lower() in row_vals for h in target_headers):
-            header_row_idx = idx
-            break
+    header_row_idx = locate_header(df_raw, target_headers, case_sensitive=False)
     if header_row_idx is None:
         raise ValueError("Header row with required columns not found.")
 
@@ -36,7 +19,7 @@ def parse_obl_statement(file_path):
     meta_values["Account Number"] = meta_values["Account Number"].replace("A/C No:", "").strip()
 
     # Transaction data
-    data_df = pd.read_excel(file_path, dtype=str, header=header_row_idx)
+    data_df = slice_below_header(df_raw, header_row_idx)
     data_df.columns = [col.strip() for col in data_df.columns]
     data_df = data_df[[col for col in target_headers if col in data_df.columns]]
     data_df = data_df.dropna(how='all')
@@ -78,13 +61,12 @@ def parse_obl_statement(file_path):
             )
 
     # UID
-    uid_list = []
-    balance_col = "Balance"
-    date_col = "norm_obl_date"
-    for idx, row in data_df.iterrows():
-        uid = generate_uid(idx + 1, row.get(date_col, ""), row.get(balance_col, ""))
-        uid_list.append(uid)
-    data_df.insert(0, "obl_uid", uid_list)
+    # OBL_<row number>_<hex yyyymmdd>_<hex rounded balance>
+    dates = data_df["norm_obl_date"] if "norm_obl_date" in data_df.columns else pd.Series(None, index=data_df.index)
+    balances = data_df["Balance"] if "Balance" in data_df.columns else pd.Series(None, index=data_df.index)
+    hex_date = hex_strings(date_numbers(dates), missing="0", hex_slice=True)
+    hex_balance = hex_strings(pd.to_numeric(balances, errors="coerce").round(), missing="0", hex_slice=True)
+    data_df.insert(0, "obl_uid", build_uid("OBL", row_numbers(data_df.index, 3), hex_date, hex_balance))
 
     # Placeholder for vendor extraction (if needed later)
     data_df["der_obl_ven"] = ""
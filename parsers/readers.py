@@ -0,0 +1,292 @@
+# parsers/readers.py
+
+import importlib.util
+import os
+import posixpath
+import re
+import zipfile
+from contextlib import contextmanager
+from datetime import date, datetime
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+from parsers.common import slice_below_header
+
+# Engines to try per file type, fastest first; the first installed one is used.
+# Rerun benchmarks/excel_readers.py on real statements before reordering.
+ENGINE_PREFERENCE = {
+    ".xlsx": ["calamine", "openpyxl"],
+    ".xlsm": ["calamine", "openpyxl"],
+    ".xls": ["calamine", "xlrd"],
+}
+
+ENGINE_MODULES = {
+    "calamine": "python_calamine",
+    "openpyxl": "openpyxl",
+    "xlrd": "xlrd",
+}
+
+# Passed to the engine's workbook loader: xlrd otherwise decodes every sheet up front
+ENGINE_KWARGS = {
+    "xlrd": {"on_demand": True},
+}
+
+
+def engine_installed(engine):
+    return importlib.util.find_spec(ENGINE_MODULES[engine]) is not None
+
+
+def excel_engine(path):
+    """The preferred installed engine for `path`'s extension, or None to let pandas choose."""
+    ext = os.path.splitext(str(path))[-1].lower()
+    for engine in ENGINE_PREFERENCE.get(ext, []):
+        if engine_installed(engine):
+            return engine
+    return None
+
+
+def open_excel(path, engine=None):
+    """pd.ExcelFile on the preferred engine; use as a context manager so the file is closed."""
+    engine = engine or excel_engine(path)
+    return pd.ExcelFile(path, engine=engine, engine_kwargs=ENGINE_KWARGS.get(engine))
+
+
+def read_sheet(path, sheet_name=None, header=None, engine=None, nrows=None):
+    """
+    One sheet as strings (NaN for blanks), like pd.read_excel(..., dtype=str, header=header).
+    sheet_name None means the first sheet. CSV and Parquet files are a single sheet, so their
+    sheet_name is ignored. nrows limits the rows read below the header.
+    """
+    if is_columnar(path):
+        grid = read_columnar(path, nrows=nrows if header is None else None)
+        grid = grid if header is None else slice_below_header(grid, header)
+        return grid if nrows is None else grid.iloc[:nrows]
+    with open_excel(path, engine) as xls:
+        if sheet_name is None:
+            sheet_name = xls.sheet_names[0]
+        elif isinstance(sheet_name, str) and sheet_name not in xls.sheet_names:
+            raise ValueError(f"Sheet '{sheet_name}' not found.")
+        return xls.parse(sheet_name, dtype=str, header=header, nrows=nrows)
+
+
+# --- CSV / Parquet: a sheet's cell grid exported as-is, metadata rows included ---
+
+COLUMNAR_EXTENSIONS = {".csv", ".parquet"}
+
+
+def is_columnar(path):
+    return os.path.splitext(str(path))[-1].lower() in COLUMNAR_EXTENSIONS
+
+
+def _cell_text(val):
+    """Typed Parquet cell as the text pandas' Excel readers give it under dtype=str."""
+    if val is None or val is pd.NaT or (isinstance(val, float) and np.isnan(val)):
+        return np.nan
+    if isinstance(val, (float, np.floating)) and float(val).is_integer():
+        return str(int(val))
+    if isinstance(val, pd.Timestamp):
+        val = val.to_pydatetime()
+    elif type(val) is date:
+        val = datetime(val.year, val.month, val.day)
+    return str(val)
+
+
+def read_columnar(path, nrows=None):
+    """
+    The grid of a CSV or Parquet export as strings, NaN for blank cells, columns 0..n-1 (the
+    frame pd.read_excel(header=None, dtype=str) gives for the sheet). Nothing is inferred: CSV
+    cells stay text ('NA', 'null' and leading zeros included), Parquet columns' own names are
+    ignored and typed cells are rendered the way the Excel readers render them. nrows keeps
+    only the first rows (Parquet is still read whole).
+    """
+    if os.path.splitext(str(path))[-1].lower() == ".csv":
+        grid = pd.read_csv(path, header=None, dtype=str, keep_default_na=False, na_values=[""],
+                           encoding="utf-8-sig", nrows=nrows)
+    else:
+        typed = pd.read_parquet(path)
+        if nrows is not None:
+            typed = typed.iloc[:nrows]
+        # dtype=str keeps NaN, giving the same column dtype as read_excel(dtype=str)
+        grid = pd.DataFrame({i: pd.Series([_cell_text(v) for v in typed[col].astype(object)], dtype=str)
+                             for i, col in enumerate(typed.columns)})
+    grid.columns = range(grid.shape[1])
+    return grid
+
+
+# Numbers as str() writes them; leading zeros (voucher/account numbers) stay text
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:e[-+]\d+)?\Z")
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?\Z")
+
+
+def _typed_cell(val):
+    """Grid text back to the value a typed Excel cell holds: None, int, float, datetime or str."""
+    if not isinstance(val, str):
+        return None
+    if _NUMBER.match(val):
+        return int(val) if val.lstrip("-").isdigit() else float(val)
+    if _TIMESTAMP.match(val):
+        return datetime.fromisoformat(val)
+    return val
+
+
+@contextmanager
+def _columnar_rows(path, sheet_name):
+    grid = read_columnar(path)
+    rows = ((row_idx, tuple(_typed_cell(v) for v in raw))
+            for row_idx, raw in enumerate(grid.itertuples(index=False, name=None), 1))
+    # Exports carry no merged ranges: a merged cell must be written out in every cell it covers
+    yield iter_unmerged_rows(rows, [])
+
+
+# --- Row streaming with merged cells filled in (tally ledgers) ---
+
+def iter_unmerged_rows(rows, ranges):
+    """
+    Yield (row_number, raw_values, filled_values) from (row_number, raw_values) pairs. In
+    filled_values every cell of a merged range holds the range's top-left value, as unmerging and
+    copying the value across did. `ranges` are 1-based (min_col, min_row, max_col, max_row) tuples;
+    only those overlapping the current row are kept.
+    """
+    starts = {}
+    for min_col, min_row, max_col, max_row in ranges:
+        starts.setdefault(min_row, []).append((min_col, max_col, max_row))
+    open_ranges = []
+    for row_idx, raw in rows:
+        for min_col, max_col, max_row in starts.pop(row_idx, ()):
+            anchor = raw[min_col - 1] if min_col <= len(raw) else None
+            open_ranges.append((min_col, max_col, max_row, anchor))
+        if not open_ranges:
+            yield row_idx, raw, raw
+            continue
+        filled = list(raw)
+        for min_col, max_col, max_row, anchor in open_ranges:
+            if len(filled) < max_col:
+                filled += [None] * (max_col - len(filled))
+            filled[min_col - 1:max_col] = [anchor] * (max_col - min_col + 1)
+        yield row_idx, raw, filled
+        open_ranges = [r for r in open_ranges if r[2] > row_idx]
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _rels_targets(zf, part):
+    """{relationship id: (type, target part)} of an OOXML package part."""
+    folder, name = posixpath.split(part)
+    rels_part = posixpath.join(folder, "_rels", name + ".rels")
+    targets = {}
+    for rel in ElementTree.fromstring(zf.read(rels_part)):
+        target = rel.get("Target")
+        target = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+        targets[rel.get("Id")] = (rel.get("Type", "").rsplit("/", 1)[-1], target)
+    return targets
+
+
+def _xlsx_sheet_part(zf, sheet_name):
+    """Zip member holding a sheet's XML: workbook part from _rels/.rels, then the sheet's r:id."""
+    workbook = next((target for kind, target in _rels_targets(zf, "").values() if kind == "officeDocument"),
+                    "xl/workbook.xml")
+    for el in ElementTree.fromstring(zf.read(workbook)).iter():
+        if _local(el.tag) == "sheet" and el.get("name") == sheet_name:
+            rel_id = next(v for k, v in el.attrib.items() if _local(k) == "id")
+            return _rels_targets(zf, workbook)[rel_id][1]
+    raise ValueError(f"Sheet '{sheet_name}' not found.")
+
+
+def _xlsx_merged_ranges(path, sheet_name):
+    """
+    Merged ranges of an .xlsx sheet. Read-only openpyxl sheets do not load merged_cells, so the
+    <mergeCell> entries are streamed from the sheet XML in the zip, discarding each row element as
+    it is passed.
+    """
+    from openpyxl.utils.cell import range_boundaries
+
+    ranges = []
+    sheet_data = None
+    with zipfile.ZipFile(path) as zf, zf.open(_xlsx_sheet_part(zf, sheet_name)) as src:
+        for event, el in ElementTree.iterparse(src, events=("start", "end")):
+            tag = _local(el.tag)
+            if event == "start":
+                if tag == "sheetData":
+                    sheet_data = el
+            elif tag == "row" and sheet_data is not None:
+                sheet_data.clear()
+            elif tag == "mergeCell":
+                ranges.append(range_boundaries(el.get("ref")))
+    return ranges
+
+
+@contextmanager
+def _openpyxl_rows(path, sheet_name):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        if ws.max_column is None:
+            # No <dimension> in the file: size the sheet so every row has the same width
+            ws.calculate_dimension(force=True)
+        rows = enumerate(ws.iter_rows(values_only=True), 1)
+        yield iter_unmerged_rows(rows, _xlsx_merged_ranges(path, sheet_name))
+    finally:
+        wb.close()
+
+
+def _calamine_value(val):
+    """calamine cell value as openpyxl returns it: None for blanks, whole floats as int, dates as datetime."""
+    if isinstance(val, str):
+        return val if val != "" else None
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+    if type(val) is date:
+        return datetime(val.year, val.month, val.day)
+    return val
+
+
+def _calamine_sheet_rows(sheet, ranges):
+    """
+    (row_number, raw_values) of a calamine sheet, converted one row at a time. iter_rows starts at
+    row 1 but at the first used column, so rows are padded back to column A; blank rows at the
+    bottom of a merged range are added, as openpyxl yields them.
+    """
+    pad = (None,) * (sheet.start[1] if sheet.start else 0)
+    row_idx = 0
+    for row_idx, raw in enumerate(sheet.iter_rows(), 1):
+        yield row_idx, pad + tuple(_calamine_value(v) for v in raw)
+    for row_idx in range(row_idx + 1, max((r[3] for r in ranges), default=0) + 1):
+        yield row_idx, ()
+
+
+@contextmanager
+def _calamine_rows(path, sheet_name):
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_path(str(path))
+    try:
+        sheet = wb.get_sheet_by_name(sheet_name)
+        ranges = [(c0 + 1, r0 + 1, c1 + 1, r1 + 1) for (r0, c0), (r1, c1) in sheet.merged_cell_ranges or []]
+        yield iter_unmerged_rows(_calamine_sheet_rows(sheet, ranges), ranges)
+    finally:
+        wb.close()
+
+
+ROW_READERS = {
+    "calamine": _calamine_rows,
+    "openpyxl": _openpyxl_rows,
+}
+
+
+def sheet_rows(path, sheet_name, engine=None):
+    """
+    Context manager streaming a sheet as (row_number, raw_values, filled_values) tuples with merged
+    ranges filled in (see iter_unmerged_rows), on the preferred engine that can stream rows.
+    """
+    if is_columnar(path):
+        return _columnar_rows(path, sheet_name)
+    engine = engine or excel_engine(path)
+    if engine not in ROW_READERS:
+        engine = "openpyxl"
+    return ROW_READERS[engine](path, sheet_name)
@@ -1,11 +1,15 @@
 # tally_parser.py
 
 import re
-import string
 import pandas as pd
-from openpyxl import load_workbook
 from calendar import month_name
 
+from logics.bank_tally_match_logic_mdb import tally_refs as mdb_tally_refs
+from logics.bank_tally_match_logic_mtb import tally_refs as mtb_tally_refs
+from parsers.common import HEADER_SCAN_ROWS, build_uid, hex_strings
+from parsers.readers import sheet_rows
+from parsers.vendors import tally_particulars, tally_vendors
+
 # ---- BEGIN BANK MAPPING ----
 BANK_ACCT_MAP = {
     # Mutual Trust Bank specific mappings
@@ -30,6 +34,14 @@ BANK_ACCT_MAP = {
 }
 # ---- END BANK MAPPING ----
 
+# Cheque ref extraction per bank, matching the rules the bank-tally matcher uses
+TALLY_REF_EXTRACTORS = {
+    "MDB": mdb_tally_refs,
+    "MTB": mtb_tally_refs,
+}
+
+TALLY_HEADERS = {"Date", "Particulars", "Vch Type", "Vch No.", "Debit", "Credit"}
+
 def clean(val):
     return str(val).strip() if val is not None else ""
 
@@ -45,73 +57,28 @@ def deduplicate_row(row, dup_map):
                     found = True
     return res
 
-def process_particulars(value):
-    if pd.isna(value):
-        return ""
-    val = str(value).replace('\r\n', '\n').replace('\r', '\n').strip()
-    lines = [line.strip() for line in val.split('\n') if line.strip()]
-    if not lines:
-        return ""
-    header = lines[0]
-    if len(lines) > 1:
-        details = ' '.join(lines[1:]).strip()
-        return f"{header}\n{details}"
-    match = re.match(r'^([A-Za-z0-9\-/ ]+)[.:,-]\s*(.+)', header)
-    if match:
-        header_part = match.group(1).strip()
-        detail_part = match.group(2).strip()
-        return f"{header_part}\n{detail_part}"
-    return header
-
-def extract_vendor_updated(particulars):
-    if pd.isna(particulars):
-        return ""
-    val_str = str(particulars).strip()
-    lines = [line.strip() for line in val_str.splitlines() if line.strip()]
-    if lines and lines[0].lower().replace(" ", "") == "(asperdetails)" and len(lines) > 1:
-        val = lines[1]
-        match = re.search(r'\b([A-Za-z]+-CE-\d+-\d+-CI)\b', val)
-        if match:
-            return match.group(1).upper().replace(" ", "")
-        match2 = re.search(r'Payable-([^-]+)-ID', val)
-        if match2:
-            return match2.group(1).strip().upper().replace(" ", "")
-        match3 = re.search(r'([A-Za-z .&-]+(?:Ltd|Limited))', val, re.IGNORECASE)
-        if match3:
-            return match3.group(1).strip().upper().replace(" ", "")
-        if 'Amount' in val:
-            prefix = val.split('Amount')[0]
-            chunks = [c.strip() for c in prefix.split('-') if c.strip()]
-            if chunks:
-                return re.sub(r'[^A-Z0-9]', '', chunks[-1].upper())
-        return val.upper().replace(" ", "")
-    else:
-        val = lines[0] if lines else ""
-        val = re.sub(r'^(adv(?:ance)?|ap)[\s\-]*', '', val, flags=re.IGNORECASE)
-        val = re.sub(r'^(m[\s\-\/]*s)[\s\-]*', '', val, flags=re.IGNORECASE)
-        val = re.split(r'-ID:', val, flags=re.IGNORECASE)[0]
-        val = re.sub(r'\band\b', '', val, flags=re.IGNORECASE)
-        val = re.sub(f'[{re.escape(string.punctuation)}\s]+', '', val)
-        return val.upper()
-
 def parse_tally_file(file_path, sheet_name):
-    wb = load_workbook(file_path, data_only=True)
-    ws = wb[sheet_name]
-
-    # --------- Find header row ---------
-    header_keywords = {"Date", "Particulars", "Vch Type", "Vch No.", "Debit", "Credit"}
-    header_row_idx = next((i for i, r in enumerate(ws.iter_rows(values_only=True), 1)
-                           if header_keywords.issubset({clean(c) for c in r})), None)
-    if not header_row_idx:
-        wb.close()
+    with sheet_rows(file_path, sheet_name) as rows:
+        return _parse_tally_rows(rows)
+
+def _parse_tally_rows(rows):
+    # --------- Find header row (raw values, within the first HEADER_SCAN_ROWS rows) ---------
+    header_keywords = TALLY_HEADERS
+    metadata_rows = []
+    header_values = None
+    for row_idx, raw, filled in rows:
+        if header_keywords.issubset({clean(c) for c in raw}):
+            header_values = filled
+            break
+        if row_idx >= HEADER_SCAN_ROWS:
+            break
+        metadata_rows.append(raw)
+    if header_values is None:
         raise ValueError("Header row not found.")
 
     # --------- Extract metadata for iloc use ---------
     # Build metadata as DataFrame for iloc reference
-    metadata_rows = []
-    for row in ws.iter_rows(min_row=1, max_row=header_row_idx-1, values_only=True):
-        metadata_rows.append([clean(c) for c in row])
-    metadata = pd.DataFrame(metadata_rows)
+    metadata = pd.DataFrame([[clean(c) for c in row] for row in metadata_rows])
 
     # --------- Hardcoded account extraction ---------
     try:
@@ -133,7 +100,6 @@ def parse_tally_file(file_path, sheet_name):
         bank_code = ""
 
     if not bank_code or not acct_no:
-        wb.close()
         raise ValueError(
             "Unmapped bank account detected or account cell missing. Update BANK_ACCT_MAP or check metadata."
         )
@@ -142,16 +108,13 @@ def parse_tally_file(file_path, sheet_name):
     try:
         ledger_period_cell = metadata.iloc[6, 0]
     except Exception:
-        wb.close()
         raise Exception("Could not access metadata cell [5, 0] for ledger period.")
 
     if not ledger_period_cell or "to" not in ledger_period_cell:
-        wb.close()
         raise Exception("Ledger period cell missing or misformatted in [5, 0].")
 
     match = re.search(r'([\d]{1,2}-[A-Za-z]{3}-[\d]{4})\s*to\s*([\d]{1,2}-[A-Za-z]{3}-[\d]{4})', ledger_period_cell)
     if not match:
-        wb.close()
         raise Exception("Could not parse dates in ledger period cell.")
 
     first_date_str, last_date_str = match.group(1), match.group(2)
@@ -159,7 +122,6 @@ def parse_tally_file(file_path, sheet_name):
         first_date = pd.to_datetime(first_date_str, format="%d-%b-%Y")
         last_date = pd.to_datetime(last_date_str, format="%d-%b-%Y")
     except Exception:
-        wb.close()
         raise Exception("Date format error in ledger period cell.")
 
     ledger_date = ""
@@ -170,19 +132,13 @@ def parse_tally_file(file_path, sheet_name):
         ledger_year = str(first_date.year)
 
     # --------- Extract unit name from first cell (A1) ---------
-    meta_unit_row = ws['A1'].value or ""
+    meta_unit_row = metadata_rows[0][0] if metadata_rows and metadata_rows[0] else ""
+    meta_unit_row = meta_unit_row or ""
     unit_match = re.search(r'Unit\s*:?[\s)]*([^)]+)', meta_unit_row)
     unit_name = unit_match.group(1).strip() if unit_match else ""
 
-    # --------- Unmerge all merged cells ---------
-    for rng in list(ws.merged_cells.ranges):
-        val = ws[rng.coord.split(":")[0]].value
-        ws.unmerge_cells(str(rng))
-        for row in ws[rng.coord]:
-            for cell in row:
-                cell.value = val
-
-    headers = [clean(c.value) if c.value else f"Unnamed_{i+1}" for i, c in enumerate(ws[header_row_idx])]
+    # Merged ranges are already filled in by iter_unmerged_rows from the header row on
+    headers = [clean(c) if c else f"Unnamed_{i+1}" for i, c in enumerate(header_values)]
 
     # Rename "Particulars" column to "dr_cr"
     headers = ["dr_cr" if h == "Particulars" and i == headers.index("Particulars") else h for i, h in enumerate(headers)]
@@ -196,7 +152,7 @@ def parse_tally_file(file_path, sheet_name):
 
     collapsed_rows = []
     current_row = None
-    for row in ws.iter_rows(min_row=header_row_idx + 1, values_only=True):
+    for _, _, row in rows:
         cleaned = [clean(c) for c in row][:num_cols] + [""] * (num_cols - len(row))
         if (
             (not cleaned[headers.index("Date")] if "Date" in headers else True)
@@ -213,7 +169,6 @@ def parse_tally_file(file_path, sheet_name):
     if current_row is not None:
         collapsed_rows.append(current_row)
 
-    wb.close()
     data_rows = collapsed_rows
     dedup_map = {v: idxs for v, idxs in pd.Series(data_rows[0]).groupby(lambda x: x).groups.items() if len(idxs) > 1}
     data_rows = [deduplicate_row(row, dedup_map) for row in data_rows]
@@ -227,8 +182,8 @@ def parse_tally_file(file_path, sheet_name):
 
     # Process "Particulars" column formatting and vendor extraction
     if "Particulars" in df.columns:
-        df["Particulars"] = df["Particulars"].apply(process_particulars)
-        df["tally_ven"] = df["Particulars"].apply(extract_vendor_updated)
+        df["Particulars"] = tally_particulars(df["Particulars"])
+        df["tally_ven"] = tally_vendors(df["Particulars"])
     else:
         df["tally_ven"] = ""
 
@@ -241,34 +196,20 @@ def parse_tally_file(file_path, sheet_name):
         df = df[df["Particulars"].str.strip().str.lower() != "opening balance"]
         df = df[~df["Particulars"].str.strip().str.lower().str.startswith("closing balance")]
 
-    def to_hex(val):
-        try:
-            return hex(int(float(val)))[2:]
-        except Exception:
-            return ""
-
-    uids = []
-    rownum = 1
-    for i, row in df.iterrows():
-        date_val = row.get("Date", "")
-        credit_val = row.get("Credit", "")
-        debit_val = row.get("Debit", "")
-        balance_val = credit_val if (pd.notna(credit_val) and str(credit_val).strip() != "") else debit_val
-        if pd.notna(date_val) and date_val != "":
-            date_str = str(date_val).replace("-", "")
-            hexdate = to_hex(date_str)
-            try:
-                hexbal = to_hex(round(float(str(balance_val).replace(",", ""))))
-            except Exception:
-                hexbal = ""
-            # uid = f"T_{bank_code}_{rownum:04d}_{hexdate}_{hexbal}"
-            uid = f"T_{bank_code}_{hexdate}_{hexbal}_{rownum:06d}"
-
-            uids.append(uid)
-            rownum += 1
-        else:
-            uids.append("")
-    df["tally_uid"] = uids
+    # T_<bank>_<hex yyyymmdd>_<hex rounded credit, else debit>_<row number>, for dated rows only;
+    # the row number counts dated rows
+    blank = pd.Series("", index=df.index)
+    dates = df["Date"] if "Date" in df.columns else blank
+    credit = df["Credit"] if "Credit" in df.columns else blank
+    debit = df["Debit"] if "Debit" in df.columns else blank
+    dated = dates.notna() & (dates != "")
+    balances = credit.where(credit.notna() & (credit.astype(str).str.strip() != ""), debit)
+    hexdate = hex_strings(pd.to_numeric(dates.astype(str).str.replace("-", ""), errors="coerce"),
+                          missing="", hex_slice=True)
+    hexbal = hex_strings(pd.to_numeric(balances.astype(str).str.replace(",", ""), errors="coerce").round(),
+                         missing="", hex_slice=True)
+    rownum = dated.cumsum().astype(str).str.zfill(6)
+    df["tally_uid"] = build_uid(f"T_{bank_code}", hexdate, hexbal, rownum).where(dated, "")
     # cols = ["tally_uid", "bank_code", "bank_acct_no", "unit_name", "statement_month", "statement_year"] + [c for c in df.columns if c not in ["tally_uid", "bank_code", "bank_acct_no", "unit_name", "statement_month", "statement_year"]]
     cols = ["tally_uid", "bank_code", "acct_no", "unit_name", "statement_month", "statement_year"] + [c for c in df.columns if c not in ["tally_uid", "bank_code", "acct_no", "unit_name", "statement_month", "statement_year"]]
 
@@ -300,5 +241,10 @@ def parse_tally_file(file_path, sheet_name):
     # Apply the column renaming to df
     df = df.rename(columns=new_column_names)
 
+    # Cheque ref for bank-tally matching; banks without cheque matching keep NULL
+    extract_refs = TALLY_REF_EXTRACTORS.get(bank_code)
+    if extract_refs and "T_Particulars" in df.columns:
+        df["cheque_ref"] = extract_refs(df["T_Particulars"])
+
     # Return the final df with the renamed columns
     return df  
\ No newline at end of file
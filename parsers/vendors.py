@@ -0,0 +1,239 @@
+# parsers/vendors.py
+
+import re
+import string
+
+import pandas as pd
+
+from logics.bank_tally_join import nth_segment_pattern
+
+# Characters str.splitlines() breaks on
+LINE_BREAK = r"[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]"
+
+
+def _is_text(values):
+    """True where the value is a str (what the old isinstance(x, str) checks tested)."""
+    if isinstance(values.dtype, pd.StringDtype):
+        return values.notna()
+    return values.map(lambda v: isinstance(v, str)).astype(bool)
+
+
+def _texts(values):
+    """
+    Values as an object Series of str(v), so NaN reads as 'nan' the way str(row[...]) did. Kept as
+    object: map() would infer the pyarrow-backed str dtype, whose strip/upper/regex rules differ
+    from Python's.
+    """
+    return pd.Series(values, dtype=object).map(str).astype(object)
+
+
+def _blank(index):
+    return pd.Series("", index=index, dtype=object)
+
+
+# --- MDB bank narrations ---
+
+_MDB_MS = re.compile(r'^M[\s./\\-]*S[\s./\\-]*', re.IGNORECASE)
+
+
+def _between_slashes(end_from_right):
+    """Text after the first '/' up to the `end_from_right`-th '/' from the right."""
+    return re.compile(rf"^[^/]*/(.*)(?:/[^/]*){{{end_from_right}}}\Z", re.DOTALL)
+
+
+# (lower-case prefix, pattern whose group 1 is the raw vendor)
+MDB_PREFIX_RULES = [
+    ("rtgs rtgs outward", _between_slashes(6)),
+    ("rtgs rtgs inward", _between_slashes(5)),
+    ("charge rtgs charge", _between_slashes(6)),
+    ("clg hv", _between_slashes(4)),
+    ("transfer beftn outward", re.compile(r"^(?:[^/]*/){3}([^/]*)/")),
+]
+_MDB_CLG_INWARD = re.compile(r"CLG- InwardCA\d{7} RV", re.IGNORECASE)
+_MDB_PAY_TO = re.compile(r"pay to :([^/]*)", re.IGNORECASE)
+_MDB_ONLINE_CASHCA = re.compile(r"^on-line cashca\d{7}([^/]*)", re.IGNORECASE)
+_MDB_ONLINE_DROP = ["Number of Tran. exceeded TP.", "No. of Tran. exceeded TP."]
+
+
+def normalize_mdb_vendors(names):
+    """Strip, drop a leading M/S, remove '.', ' ' and '-', upper-case."""
+    names = names.str.strip().str.replace(_MDB_MS, "", regex=True)
+    return names.str.replace(r"[. \-]", "", regex=True).str.upper()
+
+
+def mdb_bank_vendors(particulars):
+    """
+    bank_ven for MDB narrations. Each row goes to the first rule whose prefix it starts with
+    (case-insensitive); every rule runs as one str.extract over its own rows.
+    """
+    texts = _texts(particulars).str.strip()
+    lower = texts.str.lower()
+    vendors = _blank(texts.index)
+    pending = pd.Series(True, index=texts.index)
+
+    def assign(mask, raw):
+        vendors.loc[raw.index] = normalize_mdb_vendors(raw.str.strip()).to_numpy()
+        pending[mask] = False
+
+    for prefix, pattern in MDB_PREFIX_RULES:
+        mask = pending & lower.str.startswith(prefix)
+        if mask.any():
+            assign(mask, texts[mask].str.extract(pattern, expand=False).dropna())
+
+    mask = pending & texts.str.match(_MDB_CLG_INWARD)
+    if mask.any():
+        clg, clg_lower = texts[mask], lower[mask]
+        aligned = clg.str.len() == clg_lower.str.len()
+        raw = clg[aligned].str.extract(_MDB_PAY_TO, expand=False).dropna()
+        # lower() lengthens a few characters (e.g. 'İ'): slice those rows where 'pay to :' sits
+        # in the lowered text, as the row-wise code did
+        at = clg_lower[~aligned].str.find("pay to :")
+        at = at[at >= 0]
+        if not at.empty:
+            shifted = [text[i + len("pay to :"):].strip().split("/")[0] for text, i in zip(clg[at.index], at)]
+            raw = pd.concat([raw, pd.Series(shifted, index=at.index, dtype=object)])
+        assign(mask, raw)
+
+    mask = pending & lower.str.startswith("on-line cashca")
+    if mask.any():
+        raw = texts[mask].str.extract(_MDB_ONLINE_CASHCA, expand=False).dropna().str.strip()
+        for phrase in _MDB_ONLINE_DROP:
+            raw = raw.str.split(phrase, n=1, regex=False).str[0].str.strip()
+        assign(mask, raw)
+
+    mask = pending & lower.str.startswith("on-line cash")
+    if mask.any():
+        assign(mask, texts[mask].str[len("On-Line Cash"):])
+
+    return vendors.astype(str)
+
+
+# --- MTB bank narrations ---
+
+_MTB_MS = re.compile(r"\bM[\.\s/\\]*S\b", re.IGNORECASE)
+_MTB_EFT_VENDOR = nth_segment_pattern(3)
+
+
+def mtb_bank_vendors(details):
+    """
+    bank_ven for MTB 'Transaction Detail' values: the middle '/' parts of RTGS/MTB narrations or
+    the fourth non-blank part of EFT OCE ones, without M/S, dots and spaces, upper-cased.
+    """
+    details = pd.Series(details)
+    texts = details.astype(object).where(_is_text(details), "")
+    texts = texts.str.split().str.join(" ")
+    vendors = _blank(texts.index)
+
+    rtgs = texts.str.startswith("RTGS/MTB")
+    if rtgs.any():
+        vendors[rtgs] = texts[rtgs].str.split("/").str[2:-1].str.join(" ").str.strip()
+    eft = ~rtgs & texts.str.startswith("EFT OCE")
+    if eft.any():
+        found = texts[eft].str.extract(_MTB_EFT_VENDOR, expand=False).dropna()
+        vendors.loc[found.index] = found.str.strip()
+
+    vendors = vendors.str.replace(_MTB_MS, "", regex=True)
+    vendors = vendors.str.replace(".", "", regex=False).str.replace(" ", "", regex=False)
+    return vendors.str.upper().str.strip().astype(str)
+
+
+# --- Finance receiver names ---
+
+_FIN_MS = re.compile(r"^(M[\s\.\/]*S[\s\.]*)")
+_FIN_PUNCT = re.compile(rf"[{re.escape(string.punctuation)}]")
+
+
+def fin_vendors(names):
+    """fin_ven: upper-cased receiver name without a leading M/S, punctuation or spaces."""
+    names = pd.Series(names)
+    names = names.astype(object).where(_is_text(names), "")
+    names = names.str.upper().str.strip().str.replace(_FIN_MS, "", regex=True)
+    return names.str.replace(_FIN_PUNCT, "", regex=True).str.replace(" ", "", regex=False).astype(str)
+
+
+# --- Tally particulars ---
+
+_TALLY_HEADER_SPLIT = re.compile(r"^([A-Za-z0-9\-/ ]+)[.:,-]\s*(.+)")
+
+
+def tally_particulars(values):
+    """
+    Tidy Particulars to 'header\\ndetails': the first non-blank line, then the other lines joined
+    by spaces. A single line is split at its first '.', ':', ',' or '-' after a plain-text head.
+    """
+    values = pd.Series(values)
+    texts = _texts(values).str.replace("\r\n", "\n", regex=False).str.replace("\r", "\n", regex=False)
+    # Strip every line and drop the blank ones
+    texts = texts.str.strip().str.replace(r"\s*\n\s*", "\n", regex=True)
+    parts = texts.str.split("\n", n=1)
+    header, details = parts.str[0], parts.str[1]
+
+    out = header.astype(object)
+    multi = details.notna()
+    out[multi] = header[multi] + "\n" + details[multi].str.replace("\n", " ", regex=False)
+    split = header[~multi].str.extract(_TALLY_HEADER_SPLIT).dropna()
+    if not split.empty:
+        out.loc[split.index] = split[0].str.strip() + "\n" + split[1].str.strip()
+    out[values.isna()] = ""
+    return out.astype(str)
+
+
+_TALLY_CE_ACCOUNT = re.compile(r"\b([A-Za-z]+-CE-\d+-\d+-CI)\b")
+_TALLY_PAYABLE = re.compile(r"Payable-([^-]+)-ID")
+_TALLY_COMPANY = re.compile(r"([A-Za-z .&-]+(?:Ltd|Limited))", re.IGNORECASE)
+# Last non-blank '-' chunk of the text before 'Amount'
+_TALLY_LAST_CHUNK = re.compile(r"(?:^|-)([^-]*[^\s-][^-]*)(?:-\s*)*\Z")
+_TALLY_ADVANCE = re.compile(r"^(adv(?:ance)?|ap)[\s\-]*", re.IGNORECASE)
+_TALLY_MS = re.compile(r"^(m[\s\-\/]*s)[\s\-]*", re.IGNORECASE)
+_TALLY_ID = re.compile(r"-ID:", re.IGNORECASE)
+_TALLY_AND = re.compile(r"\band\b", re.IGNORECASE)
+_TALLY_PUNCT_SPACE = re.compile(rf"[{re.escape(string.punctuation)}\s]+")
+
+
+def _asper_vendors(lines):
+    """Vendor from the detail line of '(As per details)' entries; rules run in order."""
+    vendors = pd.Series(None, index=lines.index, dtype=object)
+    for pattern in (_TALLY_CE_ACCOUNT, _TALLY_PAYABLE, _TALLY_COMPANY):
+        pending = lines[vendors.isna()]
+        found = pending.str.extract(pattern, expand=False).dropna()
+        if not found.empty:
+            vendors.loc[found.index] = found.str.strip().str.upper().str.replace(" ", "", regex=False)
+
+    pending = lines[vendors.isna()]
+    pending = pending[pending.str.contains("Amount", regex=False)]
+    if not pending.empty:
+        prefix = pending.str.split("Amount", n=1, regex=False).str[0]
+        chunk = prefix.str.extract(_TALLY_LAST_CHUNK, expand=False).dropna()
+        if not chunk.empty:
+            vendors.loc[chunk.index] = chunk.str.strip().str.upper().str.replace(r"[^A-Z0-9]", "", regex=True)
+
+    rest = vendors.isna()
+    vendors[rest] = lines[rest].str.upper().str.replace(" ", "", regex=False)
+    return vendors
+
+
+def tally_vendors(particulars):
+    """
+    tally_ven from tidied Particulars. '(As per details)' entries take the vendor from their
+    second line; everything else cleans the first line (no Advance/AP or M/S prefix, nothing after
+    '-ID:', no 'and', punctuation or whitespace), upper-cased.
+    """
+    particulars = pd.Series(particulars)
+    texts = _texts(particulars).str.strip()
+    parts = texts.str.split(LINE_BREAK, n=1, regex=True)
+    first = parts.str[0].str.strip()
+    second = parts.str[1].fillna("").str.lstrip().str.split(LINE_BREAK, n=1, regex=True).str[0].str.strip()
+
+    asper = (first.str.lower().str.replace(" ", "", regex=False) == "(asperdetails)") & (second != "")
+    vendors = _blank(texts.index)
+    if asper.any():
+        vendors[asper] = _asper_vendors(second[asper])
+
+    lines = first[~asper]
+    lines = lines.str.replace(_TALLY_ADVANCE, "", regex=True).str.replace(_TALLY_MS, "", regex=True)
+    lines = lines.str.split(_TALLY_ID, n=1).str[0]
+    lines = lines.str.replace(_TALLY_AND, "", regex=True).str.replace(_TALLY_PUNCT_SPACE, "", regex=True)
+    vendors[~asper] = lines.str.upper()
+
+    vendors[particulars.isna()] = ""
+    return vendors.astype(str)
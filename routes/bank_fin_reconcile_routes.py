@@ -1,12 +1,14 @@
 # routes/bank_fin_reconcile_routes.py
 
+import os
 from flask import Blueprint, request, jsonify
 import pandas as pd
 from sqlalchemy import text
 from datetime import datetime
 
 from utils.db import engine, ensure_table_exists
-from logics.bank_fin_match_logic import bank_fin_match, flatten_bf_matches
+from utils.vendor_alias import alias_updated_at, get_alias_map
+from logics.bank_fin_match_logic import BF_MATCHED_DROP_COLS, FUZZY_MATCH_TYPE, bank_fin_match, flatten_bf_matches
 
 bank_fin_reconcile_bp = Blueprint('bank_fin_reconcile', __name__)
 
@@ -36,6 +38,13 @@ def reconcile():
     bank_code = request.form.get('bank_code')
     if not bank_code:
         return jsonify({'success': False, 'msg': 'bank_code is required.'})
+    # Parallel mode solves independent vendor blocks on every core
+    parallel = request.form.get('parallel', '').lower() in ('1', 'true', 'on')
+    workers = os.cpu_count() if parallel else None
+    # Incremental mode only pairs rows uploaded since this account's last run with the open pool
+    incremental = request.form.get('incremental', '').lower() in ('1', 'true', 'on')
+    state_acct = account_number or '*'
+    run_started = datetime.now().replace(microsecond=0)
 
     try:
         bank_df = pd.read_sql(
@@ -60,6 +69,19 @@ def reconcile():
         if not acct_no:
             acct_no = "UnknownAcct"
 
+        new_since = None
+        if incremental:
+            ensure_table_exists(engine, 'bf_run_state')
+            with engine.connect() as conn:
+                new_since = conn.execute(text(
+                    "SELECT last_run_at FROM bf_run_state WHERE bank_code=:bank_code AND acct_no=:acct_no"),
+                    {"bank_code": bank_code, "acct_no": state_acct}).scalar()
+                # Old rows are never re-paired with each other, so an alias saved or deleted since
+                # the last run would not reach them: run in full instead
+                alias_changed = alias_updated_at(bank_code, conn)
+                if new_since and alias_changed and alias_changed > new_since:
+                    new_since = None
+
     except Exception as e:
         return jsonify({'success': False, 'msg': f'Error loading tables: {e}'})
 
@@ -74,6 +96,15 @@ def reconcile():
             'balance_col': 'B_Balance',
             'bank_uid_col': 'bank_uid',
             'bank_ven_col': 'bank_ven',
+            # 1-to-N search limits per bank row (see DEFAULT_COMBO_LIMITS). The search caps are
+            # unset; e.g. 200 candidates / 2_000_000 evals / 5.0 s bound slow accounts, and capped
+            # rows are listed in the response's truncated_rows.
+            'max_finance_combo': 10,
+            'max_combo_candidates': None,
+            'max_combo_evals': None,
+            'combo_time_budget': None,
+            # Fuzzy vendor phase is opt-in: a Dice threshold such as 0.85 turns it on
+            'fuzzy_vendor_threshold': None,
         },
         'MTB': {
             'date_col': 'B_Date',
@@ -84,6 +115,11 @@ def reconcile():
             'balance_col': 'B_Balance',
             'bank_uid_col': 'bank_uid',
             'bank_ven_col': 'bank_ven',
+            'max_finance_combo': 10,
+            'max_combo_candidates': None,
+            'max_combo_evals': None,
+            'combo_time_budget': None,
+            'fuzzy_vendor_threshold': None,
         }
         # Add more banks here if needed
     }
@@ -93,36 +129,35 @@ def reconcile():
         return jsonify({'success': False, 'msg': f'Unsupported bank code: {bank_code}.'})
 
     try:
-        matched_rows, unmatched_bank, unmatched_finance = bank_fin_match(
-            bank_df, fin_df, config, bank_code)
-
+        matched, unmatched_bank_pos, unmatched_finance_pos, truncated = bank_fin_match(
+            bank_df, fin_df, config, bank_code, workers=workers, new_since=new_since,
+            alias_map=get_alias_map(bank_code))
+
+        # Bank rows whose 1-to-N search hit a limit, so operators can see where to raise them
+        truncated_rows = truncated[['match_type', 'reason', 'matched']].copy()
+        for col in ('bank_id', config['bank_uid_col']):
+            if col in bank_df.columns:
+                truncated_rows.insert(0, col, bank_df[col].iloc[truncated['row_pos']].to_numpy())
+        truncated_rows = truncated_rows.astype(object).where(truncated_rows.notna(), None)
+
+        is_bank = (matched['source'] == 'Bank').to_numpy()
+        matched_pos = matched['row_pos'].to_numpy()
         matched_bank_ids = []
         matched_fin_ids = []
-        for row in matched_rows:
-            if row['source'] == 'Bank' and row.get('bank_id') is not None:
-                matched_bank_ids.append(int(row['bank_id']))
-            elif row['source'] == 'Finance' and row.get('fin_id') is not None:
-                matched_fin_ids.append(int(row['fin_id']))
-
-        matched_bank_ids = list(set(matched_bank_ids))
-        matched_fin_ids = list(set(matched_fin_ids))
-
+        if 'bank_id' in bank_df.columns:
+            matched_bank_ids = bank_df['bank_id'].iloc[matched_pos[is_bank]].dropna().astype(int).unique().tolist()
+        if 'fin_id' in fin_df.columns:
+            matched_fin_ids = fin_df['fin_id'].iloc[matched_pos[~is_bank]].dropna().astype(int).unique().tolist()
 
         # --------- Build bf_matched_df BEFORE dropping columns ---------
-        bank_cols = list(bank_df.columns)
-        fin_cols = list(fin_df.columns)
         bf_matched_df = flatten_bf_matches(
-            matched_rows, bank_cols, fin_cols, run_tag=run_tag)
+            matched, bank_df, fin_df, run_tag=run_tag)
         bf_matched_df['bank_code'] = bank_code
         # bf_matched_df['date_matched'] = datetime.now()
         bf_matched_df['bf_date_matched'] = datetime.now()
 
-        # Drop helper columns if present
-        helper_cols = [
-            '_vendor_first5', '_ven_alias', '_norm_amt', '_norm_date',
-            # add any other temp/helper columns you use here
-        ]
-        bf_matched_df = bf_matched_df.drop(columns=[c for c in helper_cols if c in bf_matched_df], errors='ignore')
+        # Drop helper and other non-bf_matched columns if present
+        bf_matched_df = bf_matched_df.drop(columns=BF_MATCHED_DROP_COLS, errors='ignore')
 
         ensure_table_exists(engine, 'bf_matched')
 
@@ -142,14 +177,24 @@ def reconcile():
                 ids_str = ','.join(map(str, matched_fin_ids))
                 conn.execute(text(
                     f"UPDATE {fin_table} SET bf_is_matched=1, bf_date_matched=:dt WHERE fin_id IN ({ids_str})"), {"dt": now_str})
+            # 3. Record this run so the next incremental run starts from it
+            if incremental:
+                conn.execute(text(
+                    "INSERT INTO bf_run_state (bank_code, acct_no, last_run_at) VALUES (:bank_code, :acct_no, :dt) "
+                    "ON DUPLICATE KEY UPDATE last_run_at=:dt"),
+                    {"bank_code": bank_code, "acct_no": state_acct, "dt": run_started})
 
 
         return jsonify({
             'success': True,
-            'matched_count': len(matched_rows),
-            'unmatched_bank_count': len(unmatched_bank),
-            'unmatched_finance_count': len(unmatched_finance),
+            'matched_count': len(matched),
+            'unmatched_bank_count': len(unmatched_bank_pos),
+            'unmatched_finance_count': len(unmatched_finance_pos),
+            'fuzzy_count': int((is_bank & (matched['match_type'] == FUZZY_MATCH_TYPE).to_numpy()).sum()),
+            'truncated_count': len(truncated_rows),
+            'truncated_rows': truncated_rows.to_dict('records'),
             'run_tag': run_tag,
+            'incremental_since': new_since.strftime('%Y-%m-%d %H:%M:%S') if new_since else None,
             'inserted_to_table': len(bf_matched_df)
         })
     except Exception as e:
@@ -4,7 +4,7 @@ from sqlalchemy import text
 from datetime import datetime
 
 from utils.db import engine, ensure_table_exists
-from logics.bank_fin_tally_match_logic import bank_fin_tally_match
+from logics.bank_fin_tally_match_logic import BFT_ENGINES, BFT_MATCHED_DROP_COLS
 
 import sys
 import traceback
@@ -34,6 +34,10 @@ def reconcile_bft():
     account_number = request.form.get('account_number')
     if not bank_code or not account_number:
         return jsonify({'success': False, 'msg': 'bank_code and account_number are required.'})
+    # 'loop' walks the groups one by one, 'join' matches whole frames with merge/groupby; same output
+    bft_engine = request.form.get('bft_engine') or 'loop'
+    if bft_engine not in BFT_ENGINES:
+        return jsonify({'success': False, 'msg': f'Unknown bft_engine: {bft_engine}.'})
 
     try:
         # 1. Find all bf_match_id's for this bank/account (from BANK rows only)
@@ -78,7 +82,7 @@ def reconcile_bft():
     # Matching logic
     # bft_matched_df = bank_fin_tally_match(bf_df, tally_df, bank_code)
     run_tag = f"{bank_code}_{account_number}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    bft_matched_df = bank_fin_tally_match(bf_df, tally_df, bank_code, run_tag=run_tag)
+    bft_matched_df = BFT_ENGINES[bft_engine](bf_df, tally_df, bank_code, run_tag=run_tag)
 
 
     ensure_table_exists(engine, 'bft_matched')
@@ -89,13 +93,8 @@ def reconcile_bft():
 
     if not bft_matched_df.empty:
         bft_matched_df['input_date'] = datetime.now()
-        helper_cols = [
-            '_vendor_first5', '_ven_alias', '_norm_amt', '_norm_date',
-            # add any other temp/helper columns you use here
-        ]
-        bft_matched_df = bft_matched_df.drop(columns=[c for c in helper_cols if c in bft_matched_df], errors='ignore')
-        if 'id' in bft_matched_df.columns:
-            bft_matched_df = bft_matched_df.drop(columns=['id'])
+        # Drop helper and other non-bft_matched columns if present
+        bft_matched_df = bft_matched_df.drop(columns=BFT_MATCHED_DROP_COLS, errors='ignore')
 
         matched_bank_count = 0
         matched_tally_count = 0
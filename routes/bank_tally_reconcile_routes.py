@@ -22,12 +22,14 @@ def reconcile_bank_tally():
 
     try:
         bank_df = pd.read_sql(
-            text("SELECT * FROM bank_data WHERE bf_is_matched = 0 AND acct_no=:acct_no"),
+            text("SELECT * FROM bank_data WHERE bf_is_matched = 0 AND bt_is_matched = 0 AND acct_no=:acct_no "
+                 "AND (cheque_ref IS NULL OR cheque_ref <> '')"),
             engine, params={"acct_no": account_number}
         )
 
         tally_df = pd.read_sql(
-            text("SELECT * FROM tally_data WHERE bft_is_matched = 0 AND bank_code=:bank_code AND acct_no=:acct_no"),
+            text("SELECT * FROM tally_data WHERE bft_is_matched = 0 AND bt_is_matched = 0 "
+                 "AND bank_code=:bank_code AND acct_no=:acct_no AND (cheque_ref IS NULL OR cheque_ref <> '')"),
             engine, params={"bank_code": bank_code, "acct_no": account_number}
         )
         # DEBUG PRINTS
@@ -55,7 +57,7 @@ def reconcile_bank_tally():
     else:
         return jsonify({'success': False, 'msg': f'Bank code {bank_code} not supported for cheque reconciliation.'})
 
-    bt_matched_df = pd.DataFrame(bt_matched)
+    bt_matched_df = bt_matched  # match_cheques already returns the bt_matched layout
     print(bt_matched_df.columns.tolist())
 
     print("Columns in bt_matched_df:", bt_matched_df.columns.tolist())
@@ -63,16 +65,39 @@ def reconcile_bank_tally():
 
     # 3. Save result to DB or return as needed
     ensure_table_exists(engine, 'bt_matched')
+    now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     bt_matched_df['input_date'] = datetime.now()
 
+    matched_bank_ids = []
+    matched_tally_ids = []
+    if not bt_matched_df.empty:
+        is_bank = bt_matched_df['bt_source'] == 'Bank'
+        matched_bank_ids = bt_matched_df.loc[is_bank, 'bank_id'].dropna().astype(int).unique().tolist()
+        matched_tally_ids = bt_matched_df.loc[~is_bank, 'tally_id'].dropna().astype(int).unique().tolist()
+        bt_matched_df['bt_is_matched'] = 1
+        bt_matched_df['bt_date_matched'] = now_str
+
     # ---- Rename columns to match MySQL table names (with spaces) ----
     bt_matched_df = bt_matched_df.rename(columns={
         "Vch_Type": "Vch Type",
         "Vch_No_": "Vch No."
     })
 
-    if not bt_matched_df.empty:
-        bt_matched_df.to_sql('bt_matched', engine, if_exists='append', index=False)
+    try:
+        with engine.begin() as conn:
+            # Insert the matches and flag their source rows together, so a rerun never re-matches them
+            if not bt_matched_df.empty:
+                bt_matched_df.to_sql('bt_matched', conn, if_exists='append', index=False)
+            if matched_bank_ids:
+                ids_str = ','.join(map(str, matched_bank_ids))
+                conn.execute(text(
+                    f"UPDATE bank_data SET bt_is_matched=1, bt_date_matched=:dt WHERE bank_id IN ({ids_str})"), {"dt": now_str})
+            if matched_tally_ids:
+                ids_str = ','.join(map(str, matched_tally_ids))
+                conn.execute(text(
+                    f"UPDATE tally_data SET bt_is_matched=1, bt_date_matched=:dt WHERE tally_id IN ({ids_str})"), {"dt": now_str})
+    except Exception as e:
+        return jsonify({'success': False, 'msg': f'Error saving matches: {e}'})
 
     return jsonify({
         'success': True,
@@ -1,16 +1,21 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 import pandas as pd
 from datetime import datetime
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import IntegrityError
 
 from utils.db import engine, ensure_table_exists
+from utils.upload_cache import cached_parse, save_upload
 from routes.parsers_config import PARSERS
 from parsers.fin_parser import parse_fin_statement
 from parsers.mdb_parser import parse_mdb_statement
 from parsers.mtb_parser import parse_mtb_statement
 from parsers.tally_parser import parse_tally_file
+from parsers.readers import is_columnar
+from parsers.detect import UPLOAD_KINDS, detect_upload, parse_upload, parser_sheet
 
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -18,39 +23,82 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 upload_bp = Blueprint('upload', __name__)
 
 # A dictionary that maps each bank to the allowed statement file types
+# CSV/Parquet files are the statement sheet's cells exported as-is, metadata rows included
 BANK_FILE_EXTENSIONS = {
-    'MDB': ['.xlsx'],   # Only .xlsx for MDB
-    'MTB': ['.xls'],    # Only .xls for MTB
+    'MDB': ['.xlsx', '.csv', '.parquet'],
+    'MTB': ['.xls', '.csv', '.parquet'],
     'EBL': [],
     'OBL': [],
     'IBBL': [],
     # Add more banks here as needed
 }
 
+def check_bank_extension(kind, file_ext):
+    """Raise ValueError when `kind` is a bank whose statements never come as `file_ext`."""
+    if kind in BANK_FILE_EXTENSIONS and file_ext not in BANK_FILE_EXTENSIONS[kind]:
+        raise ValueError(f"Unsupported file type for {kind}. Allowed types: {', '.join(BANK_FILE_EXTENSIONS[kind])}")
+
+# Unique ID column of each upload table, used to spot re-uploads before inserting
+UID_COLUMNS = {
+    'bank_data': 'bank_uid',
+    'fin_data': 'fin_uid',
+    'tally_data': 'tally_uid',
+}
+
+def count_existing_uids(table, df, chunk_size=1000):
+    """How many of the frame's UIDs are already in `table` (0 if the table has no UID column)."""
+    uid_col = UID_COLUMNS.get(table)
+    if not uid_col or uid_col not in df.columns:
+        return 0
+    uids = [u for u in df[uid_col].dropna().astype(str).unique().tolist() if u]
+    query = text(f"SELECT COUNT(*) FROM {table} WHERE {uid_col} IN :uids").bindparams(
+        bindparam('uids', expanding=True))
+    found = 0
+    with engine.connect() as conn:
+        for start in range(0, len(uids), chunk_size):
+            found += conn.execute(query, {'uids': uids[start:start + chunk_size]}).scalar()
+    return found
+
+def duplicate_upload_msg(table, existing, total):
+    return (
+        f"❌ This file looks like it was already uploaded: {existing} of {total} rows "
+        f"are already in {table}. Nothing was inserted."
+    )
+
 def generic_parse(parse_func, table, file_field):
     file = request.files.get(file_field)
     sheet_name = request.form.get('sheet_name')
     msg = ""
     uploaded_filename = None
 
-    if not file or not sheet_name:
+    # CSV and Parquet files hold a single sheet
+    if not file or not (sheet_name or is_columnar(file.filename)):
         return jsonify({'success': False, 'msg': 'File or sheet not provided.'})
 
     filename = secure_filename(file.filename)
-    temp_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(temp_path)
+    # Saved under a unique name and hashed on arrival; the hash keys the parsed-result cache
+    temp_path, digest = save_upload(file, UPLOAD_FOLDER, suffix=os.path.splitext(filename)[-1].lower())
 
     try:
-        df_data = parse_func(temp_path, sheet_name=sheet_name)
-        df_data["input_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        df_data, from_cache = cached_parse(
+            digest, parse_func.__name__, sheet_name, lambda: parse_func(temp_path, sheet_name=sheet_name))
         ensure_table_exists(engine, table)
 
+        existing = count_existing_uids(table, df_data)
+        if existing:
+            return jsonify({'success': False, 'msg': duplicate_upload_msg(table, existing, len(df_data)),
+                            'uploaded_filename': None})
+
+        df_data["input_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
         if table == 'tally_data' and 'mdb_acct_no' in df_data.columns:
             df_data = df_data.rename(columns={'mdb_acct_no': 'acct_no'})
 
         df_data.to_sql(table, engine, if_exists='append', index=False)
         uploaded_filename = filename
         msg = f"✅ Successfully uploaded and parsed data from sheet: {sheet_name}"
+        if from_cache:
+            msg += " (same file parsed before; cached result reused)"
         success = True
     except IntegrityError as e:
         db_error = str(e.orig) if hasattr(e, 'orig') else str(e)
@@ -82,7 +130,6 @@ def parse_tally():
 def parse_bank():
     file = request.files.get('bank_file')
     bank_name = request.form.get('bank_name')
-    sheet_name = request.form.get('sheet_name', None)
     msg = ""
     uploaded_filename = None
 
@@ -101,15 +148,16 @@ def parse_bank():
     if file_ext not in allowed_extensions:
         return jsonify({'success': False, 'msg': f'Unsupported file type for {bank_name}. Allowed types: {", ".join(allowed_extensions)}'})
 
-    temp_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(temp_path)
+    temp_path, digest = save_upload(file, UPLOAD_FOLDER, suffix=file_ext)
 
     try:
         # Now insert data into 'bank_data' table instead of specific bank tables
+        # Bank parsers read their default sheet, so the cache is keyed on that, not the form's sheet_name
+        from_cache = False
         if bank_name == 'MDB':
-            df_data = parse_mdb_statement(temp_path)
+            df_data, from_cache = cached_parse(digest, bank_name, parser_sheet(bank_name), lambda: parse_mdb_statement(temp_path))
         elif bank_name == 'MTB':
-            df_data = parse_mtb_statement(temp_path)
+            df_data, from_cache = cached_parse(digest, bank_name, parser_sheet(bank_name), lambda: parse_mtb_statement(temp_path))
         elif bank_name == 'EBL':
             raise Exception("Parsing for Eastern Bank (EBL) is not implemented yet.")
         elif bank_name == 'OBL':
@@ -120,12 +168,19 @@ def parse_bank():
             raise Exception("Selected bank is not recognized.")
 
         # Insert all data into 'bank_data' table
-        df_data["input_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ensure_table_exists(engine, 'bank_data')  # Ensures the 'bank_data' table exists
+        existing = count_existing_uids('bank_data', df_data)
+        if existing:
+            return jsonify({'success': False, 'msg': duplicate_upload_msg('bank_data', existing, len(df_data)),
+                            'uploaded_filename': None})
+
+        df_data["input_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         df_data.to_sql('bank_data', engine, if_exists='append', index=False)  # Insert all data into 'bank_data'
 
         uploaded_filename = filename
         msg = f"✅ Successfully uploaded and parsed data for {bank_name}"
+        if from_cache:
+            msg += " (same file parsed before; cached result reused)"
         success = True
     except IntegrityError as e:
         db_error = str(e.orig) if hasattr(e, 'orig') else str(e)
@@ -145,3 +200,149 @@ def parse_bank():
             os.remove(temp_path)
 
     return jsonify({'success': success, 'msg': msg, 'uploaded_filename': uploaded_filename})
+
+
+# --- Batch upload ---
+
+# Cache keys the single-file routes use for the same parsers, so both share cached results; the
+# sheet part of the key is parser_sheet(), the sheet argument the parser actually receives
+BATCH_CACHE_KEYS = {
+    'finance': 'parse_fin_statement',
+    'tally': 'parse_tally_file',
+    'MDB': 'MDB',
+    'MTB': 'MTB',
+}
+MAX_BATCH_WORKERS = 8
+
+def parse_batch_file(temp_path, digest, kind, sheet_name):
+    """
+    Process-pool task for one batch file: detect its kind when not given, then parse it
+    (through the upload cache). Returns (kind, sheet_name, df, from_cache).
+    """
+    if not kind:
+        kind, sheet_name = detect_upload(temp_path, sheet_name)
+        # The form gave no kind, so the extension could only be checked once it was known
+        check_bank_extension(kind, os.path.splitext(temp_path)[-1].lower())
+    df_data, from_cache = cached_parse(
+        digest, BATCH_CACHE_KEYS[kind], parser_sheet(kind, sheet_name), lambda: parse_upload(temp_path, kind, sheet_name))
+    return kind, sheet_name, df_data, from_cache
+
+def insert_batch(table, entries):
+    """
+    Insert the parsed files of one table, each file in its own transaction, so a file that fails
+    is rolled back alone and every file's status says whether its rows are in the table.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        ensure_table_exists(engine, table)
+    except Exception as e:
+        for entry in entries:
+            entry.pop('df')
+            entry.update(status='failed', msg=f"❌ Error during DB insert into {table}: {e}")
+        return
+    for entry in entries:
+        df_data = entry.pop('df')
+        df_data["input_date"] = now
+        if table == 'tally_data' and 'mdb_acct_no' in df_data.columns:
+            df_data = df_data.rename(columns={'mdb_acct_no': 'acct_no'})
+        try:
+            with engine.begin() as conn:
+                df_data.to_sql(table, conn, if_exists='append', index=False, chunksize=1000)
+        except IntegrityError as e:
+            db_error = str(e.orig) if hasattr(e, 'orig') else str(e)
+            entry.update(status='failed', msg=f"❌ Database error while inserting {table}: {db_error}")
+        except Exception as e:
+            entry.update(status='failed', msg=f"❌ Error during DB insert into {table}: {e}")
+        else:
+            entry.update(status='inserted', msg=f"✅ {entry['rows']} rows inserted into {table}")
+
+@upload_bp.route('/parse_batch', methods=['POST'])
+def parse_batch():
+    """
+    Upload many statements and ledgers at once. Form fields: 'files' (repeated) plus optional
+    'kinds' and 'sheet_names' in the same order ('' = detect / first matching sheet). Kinds are
+    finance, tally, MDB and MTB. Files are parsed in a process pool, then inserted one
+    transaction per file; the response lists the outcome of every file.
+    """
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        return jsonify({'success': False, 'msg': 'No files provided.', 'files': []})
+    kinds = request.form.getlist('kinds')
+    sheet_names = request.form.getlist('sheet_names')
+
+    report, tasks = [], []
+    try:
+        for i, file in enumerate(files):
+            filename = secure_filename(file.filename)
+            file_ext = os.path.splitext(filename)[-1].lower()
+            kind = kinds[i] if i < len(kinds) and kinds[i] else None
+            sheet_name = sheet_names[i] if i < len(sheet_names) and sheet_names[i] else None
+            entry = {'filename': filename, 'kind': kind, 'sheet_name': sheet_name, 'table': None,
+                     'rows': 0, 'from_cache': False, 'status': 'pending', 'msg': ''}
+            report.append(entry)
+            if kind and kind not in UPLOAD_KINDS:
+                entry.update(status='failed', msg=f"❌ Unknown kind '{kind}'. Use one of: {', '.join(UPLOAD_KINDS)}")
+                continue
+            try:
+                check_bank_extension(kind, file_ext)
+            except ValueError as e:
+                entry.update(status='failed', msg=f"❌ {e}")
+                continue
+            temp_path, digest = save_upload(file, UPLOAD_FOLDER, suffix=file_ext)
+            tasks.append((entry, temp_path, digest))
+
+        # Parse in parallel; a single file is parsed in-process
+        workers = min(len(tasks), os.cpu_count() or 1, MAX_BATCH_WORKERS)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [(entry, pool.submit(parse_batch_file, temp_path, digest, entry['kind'], entry['sheet_name']))
+                           for entry, temp_path, digest in tasks]
+                results = []
+                for entry, future in futures:
+                    try:
+                        results.append((entry, future.result()))
+                    except Exception as e:
+                        entry.update(status='failed', msg=f"❌ Error during parsing: {e}")
+        else:
+            results = []
+            for entry, temp_path, digest in tasks:
+                try:
+                    results.append((entry, parse_batch_file(temp_path, digest, entry['kind'], entry['sheet_name'])))
+                except Exception as e:
+                    entry.update(status='failed', msg=f"❌ Error during parsing: {e}")
+
+        # Skip files already in the database or repeated within this batch
+        by_table, seen_uids = {}, {}
+        for entry, (kind, sheet_name, df_data, from_cache) in results:
+            table = UPLOAD_KINDS[kind]['table']
+            entry.update(kind=kind, sheet_name=sheet_name, table=table, rows=len(df_data), from_cache=from_cache)
+            uid_col = UID_COLUMNS[table]
+            uids = set(df_data[uid_col].dropna().astype(str)) - {''} if uid_col in df_data.columns else set()
+            if uids & seen_uids.setdefault(table, set()):
+                entry.update(status='duplicate', msg="❌ Same rows as another file in this batch. Nothing was inserted.")
+                continue
+            try:
+                existing = count_existing_uids(table, df_data)
+            except Exception as e:
+                entry.update(status='failed', msg=f"❌ Error checking for earlier uploads: {e}")
+                continue
+            if existing:
+                entry.update(status='duplicate', msg=duplicate_upload_msg(table, existing, len(df_data)))
+                continue
+            seen_uids[table] |= uids
+            entry['df'] = df_data
+            by_table.setdefault(table, []).append(entry)
+
+        for table, entries in by_table.items():
+            insert_batch(table, entries)
+    finally:
+        for _, temp_path, _ in tasks:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    inserted = sum(entry['status'] == 'inserted' for entry in report)
+    return jsonify({
+        'success': inserted > 0,
+        'msg': f"{inserted} of {len(report)} files inserted.",
+        'files': report,
+    })
@@ -0,0 +1,66 @@
+# routes/vendor_alias_routes.py
+
+from flask import Blueprint, request, jsonify
+import pandas as pd
+from sqlalchemy import text
+
+from utils.db import engine, ensure_table_exists
+from utils.vendor_alias import invalidate_alias_cache, touch_alias_state
+
+vendor_alias_bp = Blueprint('vendor_alias', __name__, url_prefix='/vendor_alias')
+
+
+@vendor_alias_bp.route('/list', methods=['POST'])
+def list_aliases():
+    bank_code = request.form.get('bank_code')
+    try:
+        ensure_table_exists(engine, 'vendor_alias')
+        query = "SELECT bank_code, vendor_name, alias_name FROM vendor_alias"
+        params = {}
+        if bank_code:
+            query += " WHERE bank_code=:bank_code"
+            params["bank_code"] = bank_code
+        df = pd.read_sql(text(query + " ORDER BY bank_code, vendor_name"), engine, params=params)
+        return jsonify({'success': True, 'aliases': df.to_dict('records')})
+    except Exception as e:
+        return jsonify({'success': False, 'msg': str(e)})
+
+
+@vendor_alias_bp.route('/save', methods=['POST'])
+def save_alias():
+    bank_code = request.form.get('bank_code')
+    vendor_name = (request.form.get('vendor_name') or '').strip().upper()
+    alias_name = (request.form.get('alias_name') or '').strip().upper()
+    if not bank_code or not vendor_name or not alias_name:
+        return jsonify({'success': False, 'msg': 'bank_code, vendor_name and alias_name are required.'})
+    try:
+        ensure_table_exists(engine, 'vendor_alias')
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO vendor_alias (bank_code, vendor_name, alias_name) VALUES (:bank_code, :vendor_name, :alias_name) "
+                "ON DUPLICATE KEY UPDATE alias_name=:alias_name"),
+                {"bank_code": bank_code, "vendor_name": vendor_name, "alias_name": alias_name})
+            touch_alias_state(conn, bank_code)
+        invalidate_alias_cache(bank_code)
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'msg': str(e)})
+
+
+@vendor_alias_bp.route('/delete', methods=['POST'])
+def delete_alias():
+    bank_code = request.form.get('bank_code')
+    vendor_name = (request.form.get('vendor_name') or '').strip().upper()
+    if not bank_code or not vendor_name:
+        return jsonify({'success': False, 'msg': 'bank_code and vendor_name are required.'})
+    try:
+        ensure_table_exists(engine, 'vendor_alias')
+        with engine.begin() as conn:
+            result = conn.execute(text(
+                "DELETE FROM vendor_alias WHERE bank_code=:bank_code AND vendor_name=:vendor_name"),
+                {"bank_code": bank_code, "vendor_name": vendor_name})
+            touch_alias_state(conn, bank_code)
+        invalidate_alias_cache(bank_code)
+        return jsonify({'success': True, 'deleted': result.rowcount})
+    except Exception as e:
+        return jsonify({'success': False, 'msg': str(e)})
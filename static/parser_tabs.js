@@ -50,14 +50,19 @@ document.querySelectorAll('.parser-form').forEach(function(form) {
         uploadedDiv.textContent = "";
         parseBtn.disabled = true;
         sheetRow.style.display = "none";
+        sheetSelect.style.display = "";
+        sheetSelect.required = true;
         if (!fileInput.files.length) {
             updateParseButtonState();
             return;
         }
 
         const file = fileInput.files[0];
-        if (parserId === "bank" && file.name.endsWith('.csv')) {
+        // CSV and Parquet exports are a single sheet: nothing to pick
+        if (/\.(csv|parquet)$/i.test(file.name)) {
             sheetRow.style.display = "none";
+            sheetSelect.style.display = "none";
+            sheetSelect.required = false;
             updateParseButtonState();
             return;
         }
@@ -302,6 +307,8 @@ document.getElementById('reconcile-form').addEventListener('submit', function(e)
     const formData = new URLSearchParams();
     formData.append('bank_code', bank_code);
     formData.append('account_number', account_number);
+    if (document.getElementById('reconcile-parallel').checked) formData.append('parallel', '1');
+    if (document.getElementById('reconcile-incremental').checked) formData.append('incremental', '1');
 
     fetch('/reconcile', {
         method: 'POST',
@@ -381,6 +388,7 @@ document.getElementById('bft-reconcile-form').addEventListener('submit', functio
     const formData = new URLSearchParams();
     formData.append('bank_code', bank_code);
     formData.append('account_number', account_number);
+    formData.append('bft_engine', document.getElementById('bft-engine-select').value);
 
     fetch('/reconcile_bft', {
         method: 'POST',
@@ -0,0 +1,42 @@
+# tests/test_bank_fin_match.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from logics.bank_fin_match_logic import bank_fin_match
+
+CONFIG = {
+    'date_col': 'B_Date',
+    'debit_col': 'B_Withdrawal',
+    'bank_ven_col': 'bank_ven',
+}
+
+
+@pytest.mark.parametrize('missing', [None, np.nan])
+def test_rows_without_a_vendor_never_match(missing):
+    # Object-dtype frames as read_sql gives them. A 1-to-1 pair (100.00 on 5 March) and a 1-to-2
+    # group (300.00 = 200.00 + 100.00 on 6 March) would match on amount and date alone; the
+    # original loop matcher paired them since None == None. Rows need a vendor key to match.
+    bank_df = pd.DataFrame({
+        'bank_ven': pd.Series([missing, missing, 'ACME TRADERS'], dtype=object),
+        'B_Withdrawal': pd.Series([100.0, 300.0, 50.0], dtype=object),
+        'B_Date': pd.Series(['2024-03-05', '2024-03-06', '2024-03-07'], dtype=object),
+    })
+    fin_df = pd.DataFrame({
+        'fin_ven': pd.Series([missing, missing, missing, 'ACME TRADERS'], dtype=object),
+        'F_Credit_Amount': pd.Series([100.0, 200.0, 100.0, 50.0], dtype=object),
+        'F_Payment_Date': pd.Series(['2024-03-05', '2024-03-06', '2024-03-06', '2024-03-07'], dtype=object),
+    })
+
+    for config in (CONFIG, dict(CONFIG, fuzzy_vendor_threshold=0.6)):
+        matched, unmatched_bank_pos, unmatched_finance_pos, _ = bank_fin_match(
+            bank_df, fin_df, config, 'MDB', alias_map={})
+
+        # Only the pair with a vendor matches
+        assert matched[['source', 'row_pos', 'match_type']].to_dict('records') == [
+            {'source': 'Bank', 'row_pos': 2, 'match_type': '1 to 1'},
+            {'source': 'Finance', 'row_pos': 3, 'match_type': '1 to 1'},
+        ]
+        assert list(unmatched_bank_pos) == [0, 1]
+        assert list(unmatched_finance_pos) == [0, 1, 2]
@@ -0,0 +1,49 @@
+# tests/test_combo_limits.py
+
+import pandas as pd
+
+from logics.bank_fin_match_logic import DEFAULT_COMBO_LIMITS, bank_fin_match, combo_limits
+
+CONFIG = {
+    'date_col': 'B_Date',
+    'debit_col': 'B_Withdrawal',
+    'bank_ven_col': 'bank_ven',
+}
+
+
+def frames():
+    bank_df = pd.DataFrame({
+        'bank_ven': pd.Series(['ACME TRADERS'], dtype=object),
+        'B_Withdrawal': ['300.00'],
+        'B_Date': ['2024-03-05'],
+    })
+    fin_df = pd.DataFrame({
+        'fin_ven': pd.Series(['ACME TRADERS'] * 3, dtype=object),
+        'F_Credit_Amount': ['100.00'] * 3,
+        'F_Payment_Date': ['2024-03-05'] * 3,
+    })
+    return bank_df, fin_df
+
+
+def test_search_limits_are_off_by_default():
+    limits = combo_limits(CONFIG)
+    assert limits == DEFAULT_COMBO_LIMITS
+    assert limits['max_combo_candidates'] is None
+    assert limits['max_combo_evals'] is None
+    assert limits['combo_time_budget'] is None
+
+    matched, _, _, truncated = bank_fin_match(*frames(), CONFIG, 'MDB', alias_map={})
+    assert matched['match_type'].tolist() == ['1 to 3'] * 4
+    assert truncated.empty
+
+
+def test_capped_rows_are_reported():
+    config = dict(CONFIG, max_combo_candidates=2)
+    matched, unmatched_bank_pos, _, truncated = bank_fin_match(*frames(), config, 'MDB', alias_map={})
+    assert matched.empty
+    assert list(unmatched_bank_pos) == [0]
+    # Once per 1-to-N phase that searched the row
+    assert not truncated.empty
+    assert set(truncated['row_pos']) == {0}
+    assert set(truncated['reason']) == {'candidates'}
+    assert not truncated['matched'].any()
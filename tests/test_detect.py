@@ -0,0 +1,24 @@
+# tests/test_detect.py
+
+import pytest
+
+from parsers.detect import UPLOAD_KINDS, parser_sheet
+
+
+def test_parser_sheet_is_what_the_bank_parsers_read():
+    # /parse_bank calls the bank parsers without a sheet; batch uploads pass the detected one
+    assert parser_sheet('MDB') is None
+    assert parser_sheet('MDB', 'Sheet1') is None
+    assert parser_sheet('MTB') == 'AcStatementReport'
+    assert parser_sheet('MTB', 'AcStatementReport') == parser_sheet('MTB')
+
+
+def test_parser_sheet_passes_named_sheets_through():
+    for kind in ('finance', 'tally'):
+        assert parser_sheet(kind, 'Ledger') == 'Ledger'
+
+
+def test_parser_sheet_covers_every_kind():
+    assert all('sheet' in spec for spec in UPLOAD_KINDS.values())
+    with pytest.raises(ValueError):
+        parser_sheet('EBL')
@@ -0,0 +1,54 @@
+# tests/test_fuzzy_vendor.py
+
+import pandas as pd
+
+from logics.bank_fin_match_logic import FUZZY_MATCH_TYPE, bank_fin_match
+
+CONFIG = {
+    'date_col': 'B_Date',
+    'debit_col': 'B_Withdrawal',
+    'bank_ven_col': 'bank_ven',
+}
+
+
+def run_match(bank_ven, fin_ven, threshold):
+    bank_df = pd.DataFrame({
+        'bank_ven': pd.Series([bank_ven], dtype=object),
+        'B_Withdrawal': ['1500.00'],
+        'B_Date': ['2024-03-05'],
+    })
+    fin_df = pd.DataFrame({
+        'fin_ven': pd.Series([fin_ven], dtype=object),
+        'F_Credit_Amount': ['1500.00'],
+        'F_Payment_Date': ['2024-03-05'],
+    })
+    config = dict(CONFIG, fuzzy_vendor_threshold=threshold)
+    matched, _, _, _ = bank_fin_match(bank_df, fin_df, config, 'MDB', alias_map={})
+    return matched
+
+
+def test_fuzzy_phase_is_off_by_default():
+    matched, _, _, _ = bank_fin_match(
+        pd.DataFrame({'bank_ven': pd.Series(['M S RAHIM ENTERPRISE'], dtype=object),
+                      'B_Withdrawal': ['1500.00'], 'B_Date': ['2024-03-05']}),
+        pd.DataFrame({'fin_ven': pd.Series(['MS RAHIM ENTERPRISE'], dtype=object),
+                      'F_Credit_Amount': ['1500.00'], 'F_Payment_Date': ['2024-03-05']}),
+        CONFIG, 'MDB', alias_map={})
+    assert matched.empty
+
+
+def test_fuzzy_pair_is_tagged():
+    matched = run_match('M S RAHIM ENTERPRISE', 'MS RAHIM ENTERPRISE', 0.85)
+    assert matched['source'].tolist() == ['Bank', 'Finance']
+    assert set(matched['match_type']) == {FUZZY_MATCH_TYPE}
+
+
+def test_legal_suffix_is_tolerated():
+    matched = run_match('M S ACME TRADERS LTD', 'MS ACME TRADERS', 0.75)
+    assert set(matched['match_type']) == {FUZZY_MATCH_TYPE}
+
+
+def test_near_miss_names_do_not_match():
+    # Same amount and date, high whole-name similarity, different vendors
+    assert run_match('M S RAHIM ENTERPRISE', 'MS KARIM ENTERPRISE', 0.6).empty
+    assert run_match('M S RAHIM ENTERPRISE', 'MS ENTERPRISE', 0.6).empty
@@ -0,0 +1,80 @@
+# tests/test_matched_columns.py
+"""
+The frames the reconcile routes write to bf_matched and bft_matched may only carry columns those
+tables have: columns added to bank_data, fin_data or tally_data leak in through SELECT *.
+"""
+
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+
+from logics.bank_fin_match_logic import BF_MATCHED_DROP_COLS, flatten_bf_matches
+from logics.bank_fin_tally_match_logic import BFT_ENGINES, BFT_MATCHED_DROP_COLS
+
+SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, "bank_recon_query.sql")
+
+
+def table_columns(table):
+    """Column names of `table`'s CREATE TABLE in bank_recon_query.sql."""
+    with open(SCHEMA, encoding="utf-8") as f:
+        ddl = f.read()
+    body = re.search(rf"CREATE TABLE IF NOT EXISTS {table} \((.*?)\n\);", ddl, re.S).group(1)
+    cols = []
+    for line in body.splitlines():
+        line = line.strip()
+        if not line or line.startswith("--") or line.split()[0] in ("INDEX", "UNIQUE", "PRIMARY", "KEY"):
+            continue
+        cols.append(line.split()[0])
+    return cols
+
+
+def table_frame(table, n_rows, **values):
+    """n_rows rows holding every column of `table` (SELECT * FROM table), with `values` filled in."""
+    df = pd.DataFrame({col: [None] * n_rows for col in table_columns(table)})
+    for col, vals in values.items():
+        df[col] = vals
+    return df
+
+
+def test_bf_matched_frame_fits_table():
+    bank_df = table_frame("bank_data", 1, bank_id=[1], bank_uid=["B1"], B_Withdrawal=[150.0], cheque_ref=["123"])
+    fin_df = table_frame("fin_data", 2, fin_id=[1, 2], fin_uid=["F1", "F2"], F_Credit_Amount=[100.0, 50.0])
+    matched = pd.DataFrame({
+        "bf_match_id": ["BFM_0001"] * 3,
+        "source": ["Bank", "Finance", "Finance"],
+        "row_pos": [0, 0, 1],
+        "match_type": ["1 to 2"] * 3,
+    })
+
+    # As /reconcile builds it
+    bf_matched_df = flatten_bf_matches(matched, bank_df, fin_df, run_tag="T")
+    bf_matched_df["bank_code"] = "MDB"
+    bf_matched_df["bf_date_matched"] = datetime.now()
+    bf_matched_df = bf_matched_df.drop(columns=BF_MATCHED_DROP_COLS, errors="ignore")
+    bf_matched_df["bf_is_matched"] = 1
+
+    assert len(bf_matched_df) == 3
+    assert set(bf_matched_df.columns) - set(table_columns("bf_matched")) == set()
+
+
+def test_bft_matched_frame_fits_table():
+    bf_df = table_frame(
+        "bf_matched", 2,
+        bf_id=[1, 2], bf_match_id=["BFM_0001"] * 2, bf_source=["Bank", "Finance"],
+        B_Withdrawal=[100.0, None], F_Voucher_No=[None, "PV-17"], F_Credit_Amount=[None, 100.0],
+    )
+    tally_df = table_frame(
+        "tally_data", 1,
+        tally_id=[1], tally_uid=["T1"], T_Vch_No=["17"], T_Credit=[100.0], cheque_ref=["123"],
+    )
+
+    for name, bft_engine in BFT_ENGINES.items():
+        # As /reconcile_bft builds it
+        bft_matched_df = bft_engine(bf_df.copy(), tally_df.copy(), "MDB", run_tag="T")
+        bft_matched_df["input_date"] = datetime.now()
+        bft_matched_df = bft_matched_df.drop(columns=BFT_MATCHED_DROP_COLS, errors="ignore")
+
+        assert len(bft_matched_df) == 3, name
+        assert set(bft_matched_df.columns) - set(table_columns("bft_matched")) == set(), name
@@ -0,0 +1,53 @@
+# tests/test_readers.py
+
+import pytest
+
+from parsers.readers import sheet_rows
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+@pytest.fixture
+def offset_ledger(tmp_path):
+    """A sheet whose data starts at C3, with C7:E8 merged, after a sheet with merges of its own."""
+    wb = openpyxl.Workbook()
+    wb.active.title = "Summary"
+    wb.active["A1"] = "summary"
+    wb.active.merge_cells("A1:B4")
+    ws = wb.create_sheet("Ledger")
+    ws["C3"] = "Date"
+    ws["D3"] = "Particulars"
+    ws["E3"] = "Credit"
+    ws["C4"] = "2025-02-01"
+    ws["D4"] = "ACME"
+    ws["E4"] = 2.5
+    ws["C7"] = "merged"
+    ws.merge_cells("C7:E8")
+    path = tmp_path / "ledger.xlsx"
+    wb.save(path)
+    return path
+
+
+def rows_of(path, engine):
+    with sheet_rows(path, "Ledger", engine=engine) as rows:
+        # Trailing blanks depend on the engine's idea of the sheet width
+        return [(row_idx, _trim(raw), _trim(filled)) for row_idx, raw, filled in rows]
+
+
+def _trim(values):
+    values = list(values)
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+
+def test_openpyxl_rows_fill_merged_ranges(offset_ledger):
+    rows = rows_of(offset_ledger, "openpyxl")
+    assert rows[2] == (3, [None, None, "Date", "Particulars", "Credit"], [None, None, "Date", "Particulars", "Credit"])
+    assert rows[6][2] == rows[7][2] == [None, None, "merged", "merged", "merged"]
+    assert rows[7][1] == []
+
+
+def test_calamine_rows_match_openpyxl(offset_ledger):
+    pytest.importorskip("python_calamine")
+    assert rows_of(offset_ledger, "calamine") == rows_of(offset_ledger, "openpyxl")
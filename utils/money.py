@@ -0,0 +1,19 @@
+# utils/money.py
+
+import pandas as pd
+
+
+def to_cents(values):
+    """
+    Convert DECIMAL(18,2) amounts (Decimal, float or numeric strings) to nullable Int64 cents.
+    Matchers compare and sum these integers instead of floats, so 0.1 + 0.2 == 0.3 holds.
+    """
+    amounts = pd.to_numeric(pd.Series(values), errors='coerce')
+    return (amounts * 100).round().astype('Int64')
+
+
+def column_cents(df, col):
+    """to_cents for an optional column, with missing columns and amounts counted as 0."""
+    if col not in df.columns:
+        return pd.Series(0, index=df.index, dtype='int64')
+    return to_cents(df[col]).fillna(0).astype('int64')
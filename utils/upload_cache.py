@@ -0,0 +1,113 @@
+# utils/upload_cache.py
+
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+CACHE_FOLDER = os.path.join('uploads', 'cache')
+CACHE_VERSION = 1  # bump when parser output changes, so older entries stop matching
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+MAX_CACHE_AGE = 7 * 24 * 3600  # seconds since last use
+CHUNK_SIZE = 1024 * 1024
+
+os.makedirs(CACHE_FOLDER, exist_ok=True)
+_evict_lock = threading.Lock()
+
+
+def save_upload(file_storage, folder, suffix=""):
+    """
+    Stream an uploaded file into a unique temp file in `folder`, hashing it on the way.
+    Returns (temp_path, sha256 hex digest of the content).
+    """
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix=suffix)
+    with os.fdopen(fd, 'wb') as out:
+        while True:
+            chunk = file_storage.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return temp_path, digest.hexdigest()
+
+
+def cache_path(digest, parser, sheet_name=None):
+    """Parquet path for one (content hash, parser, sheet); sheet names are hashed to stay path-safe."""
+    sheet_key = hashlib.sha1(str(sheet_name or "").encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_FOLDER, f"{digest}_{parser}_{sheet_key}_v{CACHE_VERSION}.parquet")
+
+
+def load_cached(path):
+    """The cached frame at `path`, or None. A hit refreshes the entry's age."""
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+        os.utime(path)
+        return df
+    except Exception as e:
+        print(f"upload cache read failed for {path}: {e}")
+        return None
+
+
+def store_cached(path, df):
+    """Write a parsed frame to the cache (atomically), then evict by age and size."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        # No Parquet engine installed, or a column Parquet cannot hold: just skip caching
+        print(f"upload cache write skipped: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    evict_cache()
+
+
+def evict_cache(max_bytes=MAX_CACHE_BYTES, max_age=MAX_CACHE_AGE):
+    """Drop entries unused for `max_age` seconds, then the least recently used until under `max_bytes`."""
+    with _evict_lock:
+        now = time.time()
+        entries = []
+        for path in glob.glob(os.path.join(CACHE_FOLDER, "*.parquet")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > max_age:
+                _remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def cached_parse(digest, parser, sheet_name, parse):
+    """
+    parse() for an upload, served from the cache when the same content was parsed before with
+    the same parser and sheet. Returns (df, from_cache).
+    """
+    path = cache_path(digest, parser, sheet_name)
+    df = load_cached(path)
+    if df is not None:
+        return df, True
+    df = parse()
+    store_cached(path, df)
+    return df, False
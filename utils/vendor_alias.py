@@ -0,0 +1,72 @@
+# utils/vendor_alias.py
+
+import threading
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils.db import engine
+
+# bank_code -> (vendor_alias_state.updated_at when loaded, {VENDOR_NAME: ALIAS_NAME})
+_alias_cache = {}
+_alias_cache_lock = threading.Lock()
+
+
+def load_alias_map(bank_code):
+    """Read one bank's aliases from the vendor_alias table, keyed by upper-cased vendor name."""
+    df = pd.read_sql(
+        text("SELECT vendor_name, alias_name FROM vendor_alias WHERE bank_code=:bank_code"),
+        engine, params={"bank_code": bank_code}
+    )
+    vendor_names = df['vendor_name'].astype(str).str.strip().str.upper()
+    alias_names = df['alias_name'].astype(str).str.strip().str.upper()
+    return dict(zip(vendor_names, alias_names))
+
+
+def alias_updated_at(bank_code, conn=None):
+    """When the bank's aliases were last saved or deleted (vendor_alias_state), None if never."""
+    query = text("SELECT updated_at FROM vendor_alias_state WHERE bank_code=:bank_code")
+    if conn is not None:
+        return conn.execute(query, {"bank_code": bank_code}).scalar()
+    with engine.connect() as conn:
+        return conn.execute(query, {"bank_code": bank_code}).scalar()
+
+
+def touch_alias_state(conn, bank_code):
+    """Record an alias change for the bank; call inside the transaction that makes the change."""
+    conn.execute(text(
+        "INSERT INTO vendor_alias_state (bank_code, updated_at) VALUES (:bank_code, :dt) "
+        "ON DUPLICATE KEY UPDATE updated_at=:dt"),
+        {"bank_code": bank_code, "dt": datetime.now()})
+
+
+def get_alias_map(bank_code):
+    """
+    Alias mapping for a bank, cached per process. Each call checks vendor_alias_state (one
+    primary-key read) and reloads when the aliases changed since the cached copy was loaded, so
+    an edit made through any worker is seen by every worker.
+    Returns None if the tables cannot be read, so callers fall back to the built-in aliases.
+    """
+    try:
+        updated_at = alias_updated_at(bank_code)
+        with _alias_cache_lock:
+            cached = _alias_cache.get(bank_code)
+        if cached is not None and cached[0] == updated_at:
+            return cached[1]
+        alias_map = load_alias_map(bank_code)
+    except Exception as e:
+        print(f"vendor_alias unavailable, using built-in aliases: {e}")
+        return None
+    with _alias_cache_lock:
+        _alias_cache[bank_code] = (updated_at, alias_map)
+    return alias_map
+
+
+def invalidate_alias_cache(bank_code=None):
+    """Drop the cached mapping for one bank, or for every bank."""
+    with _alias_cache_lock:
+        if bank_code is None:
+            _alias_cache.clear()
+        else:
+            _alias_cache.pop(bank_code, None)